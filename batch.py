@@ -0,0 +1,144 @@
+import numpy as np
+
+from engine import FLEET_UNITS
+from fleet import compileGame
+
+
+NO_WINNER = 0
+PLAYER = 1
+COMPUTER = 2
+
+
+def shipArray(fleet):
+    """
+    :param fleet: CompiledFleet on the 10x10 board
+    :return: (ships, sizes) where ships is an integer array of shape (100,) with the number of the ship on every cell
+    (-1 for open water) and sizes the array of the ship sizes
+    """
+    ships = np.array([fleet.shipAt(row, col) for row in range(1, 11) for col in range(1, 11)])
+    return ships, np.array([fleet.getSize(ship) for ship in range(len(fleet))])
+
+
+def neighbourGrid(grids):
+    """
+    :param grids: (n, 100) boolean array
+    :return: (n, 100) boolean array of the cells next to a True cell of each grid
+    """
+    grids = grids.reshape(-1, 10, 10)
+    neighbours = np.zeros_like(grids)
+    neighbours[:, 1:, :] |= grids[:, :-1, :]
+    neighbours[:, :-1, :] |= grids[:, 1:, :]
+    neighbours[:, :, 1:] |= grids[:, :, :-1]
+    neighbours[:, :, :-1] |= grids[:, :, 1:]
+    return neighbours.reshape(-1, 100)
+
+
+class BatchSimulator:
+    """
+    Plays K games in lockstep. Each grid of the engine is kept for every game as a boolean array of shape (K, 10, 10)
+    (stored flattened as (K, 100)), and one call to step advances every unfinished game by one turn with array
+    operations only. Both sides play the hunt/target strategy of HuntShooter: a random unvisited cell while there are
+    no potentials, otherwise a random potential cell, and every hit marks its unvisited neighbours as potentials.
+    Every ship has a hit counter per game, and when a ship sinks the potentials that are not next to a hit of a ship
+    still afloat are dropped.
+    """
+    def __init__(self, games, data, seed=None):
+        """
+        :param games: number of games K played at the same time
+        :param data: fleet dictionary in the usrData.json format, used for every game
+        :param seed: seed for the NumPy random generator
+        """
+        playerFleet, enemyFleet = compileGame(data)
+        self._rng = np.random.default_rng(seed)
+        self._games = games
+        self._user, self._userSizes = shipArray(playerFleet)        # Fleets are shared and never written
+        self._computer, self._computerSizes = shipArray(enemyFleet)
+        self._userHits = np.zeros((games, len(playerFleet)), dtype=np.int32)        # Hits on every ship
+        self._computerHits = np.zeros((games, len(enemyFleet)), dtype=np.int32)
+        self._open = np.zeros((games, 100), dtype=bool)     # Computer hits on ships still afloat
+        self._playerOpen = np.zeros((games, 100), dtype=bool)
+        self._attempts = np.zeros((games, 100), dtype=bool)     # Computer shots and targets
+        self._potentials = np.zeros((games, 100), dtype=bool)
+        self._playerAttempts = np.zeros((games, 100), dtype=bool)       # Player shots and targets
+        self._playerPotentials = np.zeros((games, 100), dtype=bool)
+        self._playerCount = np.full(games, FLEET_UNITS)
+        self._computerCount = np.full(games, FLEET_UNITS)
+        self._turns = np.zeros(games, dtype=np.int32)
+        self._winners = np.full(games, NO_WINNER, dtype=np.int8)
+
+    def _shoot(self, games, attempts, potentials, openHits, ships, sizes, shipHits, counts):
+        """
+        Makes one hunt/target shot in each of the given games.
+        :param games: indices of the games that shoot
+        :param attempts: (K, 100) visited cells of the shooting side, updated in place
+        :param potentials: (K, 100) target cells of the shooting side, updated in place
+        :param openHits: (K, 100) hits of the shooting side on ships still afloat, updated in place
+        :param ships: (100,) ship numbers of the fleet that is shot at, see shipArray
+        :param sizes: sizes of the ships of that fleet
+        :param shipHits: (K, ships) hits on every ship of that fleet, updated in place
+        :param counts: (K,) remaining units of that fleet, updated in place
+        """
+        visited = attempts[games]
+        targets = potentials[games]
+        targeting = targets.any(axis=1)
+        candidates = np.where(targeting[:, None], targets, ~visited)
+        keys = self._rng.random(candidates.shape)       # A uniform random candidate is the one with the largest key
+        keys[~candidates] = -1.0
+        shots = keys.argmax(axis=1)
+        attempts[games, shots] = True
+        potentials[games, shots] = False
+        hits = ships[shots] >= 0
+        counts[games] -= hits
+
+        hitGames = games[hits]
+        hitShots = shots[hits]
+        openHits[hitGames, hitShots] = True
+        rows, cols = np.divmod(hitShots, 10)
+        for neighbours, valid in ((hitShots - 10, rows > 0), (hitShots + 10, rows < 9),
+                                  (hitShots - 1, cols > 0), (hitShots + 1, cols < 9)):
+            g = hitGames[valid]
+            n = neighbours[valid]
+            potentials[g, n] |= ~attempts[g, n]
+
+        hitShips = ships[hitShots]
+        shipHits[hitGames, hitShips] += 1
+        sinking = shipHits[hitGames, hitShips] == sizes[hitShips]
+        if sinking.any():
+            g = hitGames[sinking]
+            openHits[g] &= ships[None, :] != hitShips[sinking][:, None]
+            potentials[g] &= neighbourGrid(openHits[g])
+
+    def step(self):
+        """
+        Advances every unfinished game by one turn: the player shoots, then the computer answers.
+        :return: number of games that were still running
+        """
+        games = np.flatnonzero(self._winners == NO_WINNER)
+        if games.size == 0:
+            return 0
+        self._shoot(games, self._playerAttempts, self._playerPotentials, self._playerOpen, self._computer,
+                    self._computerSizes, self._computerHits, self._computerCount)
+        self._shoot(games, self._attempts, self._potentials, self._open, self._user, self._userSizes, self._userHits,
+                    self._playerCount)
+        self._turns[games] += 1
+        computerWon = self._playerCount[games] == 0       # The computer wins a tie, like in the engine
+        playerWon = ~computerWon & (self._computerCount[games] == 0)
+        self._winners[games[computerWon]] = COMPUTER
+        self._winners[games[playerWon]] = PLAYER
+        return games.size
+
+    def run(self):
+        """
+        Plays every game to the end.
+        :return: (turns, winners) arrays of shape (K,). Winners are PLAYER or COMPUTER.
+        """
+        while self.step():
+            pass
+        return self._turns.copy(), self._winners.copy()
+
+
+def simulate(games, data, seed=None):
+    """
+    :return: (turns, winners) arrays for the given number of games. See BatchSimulator.
+    """
+    return BatchSimulator(games, data, seed).run()
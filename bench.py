@@ -0,0 +1,255 @@
+"""
+Benchmarks of the engine, computer intelligence and rendering hot paths, and of the start up time.
+
+Every benchmark reports calls per second, the p50 and p99 time of one call and the bytes allocated by one call (peak,
+measured with tracemalloc on a separate, smaller run). Results can be saved as a baseline JSON file and later runs are
+compared against it: a benchmark whose calls per second drop by more than its threshold is reported as a regression
+and the exit code is 1.
+
+Usage: python bench.py [--save] [--baseline FILE] [--only NAME ...] [--samples N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from engine import BattleshipEngine, HuntShooter, Player, loadFleetData
+from fleet import compileGame
+
+
+BASELINE = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.3         # Allowed drop in calls per second before a benchmark counts as a regression
+
+
+class Benchmark:
+    """
+    A function to time. setup is called before every sample and its result passed to the function, so the setup cost
+    is never measured. One sample runs the function inner times in a row. samples, if given, replaces the number of
+    samples asked for on the command line, for benchmarks too slow to run hundreds of times.
+    """
+    def __init__(self, name, function, setup=None, inner=1, threshold=DEFAULT_THRESHOLD, samples=None):
+        self.name = name
+        self.function = function
+        self.setup = setup
+        self.inner = inner
+        self.threshold = threshold
+        self.samples = samples
+
+    def _sample(self):
+        state = self.setup() if self.setup is not None else None
+        function = self.function
+        start = time.perf_counter_ns()
+        for i in range(self.inner):
+            function(state)
+        return (time.perf_counter_ns() - start) / self.inner
+
+    def run(self, samples):
+        """
+        :param samples: number of timed samples
+        :return: dictionary with opsPerSec, p50ns, p99ns and allocBytes
+        """
+        samples = self.samples if self.samples is not None else samples
+        for i in range(max(1, samples // 10)):     # Warm up
+            self._sample()
+        times = sorted(self._sample() for i in range(samples))
+
+        tracemalloc.start()
+        allocated = 0
+        allocSamples = max(1, min(samples, 100))
+        for i in range(allocSamples):
+            state = self.setup() if self.setup is not None else None
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            self.function(state)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+        mean = sum(times) / len(times)
+        return {
+            "opsPerSec": 1e9 / mean if mean else 0.0,
+            "p50ns": times[len(times) // 2],
+            "p99ns": times[int(0.99 * (len(times) - 1))],
+            "allocBytes": allocated / allocSamples,
+        }
+
+
+def engineBenchmarks():
+    """
+    :return: benchmarks that only need the engine
+    """
+    data = loadFleetData("usrData.json")
+    playerFleet, enemyFleet = compileGame(data)
+    rng = random.Random(0)
+    cells = [(rng.randint(1, 10), rng.randint(1, 10)) for i in range(1000)]
+    grid = Player()
+    for row, col in cells[:30]:
+        grid.makeTrue(row, col)
+    position = [0]
+
+    def nextCell():
+        position[0] = (position[0] + 1) % len(cells)
+        return cells[position[0]]
+
+    def lateGameShooter():
+        shooter = HuntShooter(random.Random(rng.random()))
+        for i in range(90):
+            row, col = shooter.nextShot()
+            shooter.recordResult(row, col, False)
+        return shooter
+
+    def partialShooter():
+        shooter = HuntShooter(random.Random(rng.random()))
+        for i in range(40):
+            shooter.nextShot()
+        return shooter
+
+    def fullGame(state):
+        engine = BattleshipEngine(random.Random(rng.random()))
+        engine.setFleets(playerFleet, enemyFleet)
+        engine.playGame()
+
+    return [
+        Benchmark("player.isTrue", lambda state: grid.isTrue(*nextCell()), inner=1000),
+        Benchmark("player.makeTrue", lambda state: Player().makeTrue(*nextCell()), inner=1000),
+        Benchmark("player.isAllFalse", lambda state: grid.isAllFalse(), inner=1000),
+        Benchmark("hunt.changePotentials", lambda shooter: shooter.changePotentials(*nextCell()), partialShooter),
+        Benchmark("hunt.lateGameShot", lambda shooter: shooter.nextShot(), lateGameShooter),
+        Benchmark("engine.fullGame", fullGame),
+        Benchmark("fleet.loadFleets", lambda state: BattleshipEngine().loadFleets(data), inner=10),
+    ]
+
+
+def renderBenchmarks():
+    """
+    :return: benchmarks of the draw path of Battleship.run, using the SDL dummy video driver. Empty if pygame is not
+    installed.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        from gui import Battleship
+    except ImportError:
+        return []
+
+    def makeGame(incremental):
+        game = Battleship(incremental=incremental)
+        game.displayBoards()
+        game.initFleets()
+        game.render()
+        return game
+
+    fullGame = makeGame(False)
+    idleGame = makeGame(True)
+    shots = iter([f"{letter},{number}" for letter in "ABCDEFGHIJ" for number in range(1, 11)] * 1000)
+    shotGame = [makeGame(True)]
+
+    def shotFrame(state):
+        game = shotGame[0]
+        if game.sendAttack(next(shots)) is False or game._engine.winner() is not None:
+            shotGame[0] = game = makeGame(True)       # Board full, start a new one
+        game.render()
+
+    return [
+        Benchmark("render.fullFrame", lambda state: fullGame.render(), inner=10),
+        Benchmark("render.idleFrame", lambda state: idleGame.render(), inner=100),
+        Benchmark("render.shotFrame", shotFrame, threshold=0.5),     # Includes sprite creation, so it varies more
+    ]
+
+
+FIRST_FRAME = """
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+from gui import Battleship
+game = Battleship()
+game.displayBoards()
+game.initFleets()
+game.render()
+"""
+
+HEADLESS_IMPORT = """
+import sys
+import batch, engine, main, replay, server, tournament
+if "pygame" in sys.modules:
+    sys.exit("pygame was imported")
+"""
+
+
+def startupBenchmarks():
+    """
+    :return: benchmarks that start a new interpreter, so they measure a cold start: imports, pygame initialization and
+    asset loading included. startup.firstFrame is the time from launch to the first frame drawn (on the SDL dummy video
+    driver), startup.headlessImport the time to import the modules used without a window, which must not load pygame.
+    """
+    def runScript(script):
+        subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    benchmarks = []
+    if importlib.util.find_spec("pygame") is not None:
+        benchmarks.append(Benchmark("startup.firstFrame", lambda state: runScript(FIRST_FRAME), threshold=0.5,
+                                    samples=10))
+    return [Benchmark("startup.headlessImport", lambda state: runScript(HEADLESS_IMPORT), threshold=0.5,
+                      samples=10)] + benchmarks
+
+
+def compare(results, baseline):
+    """
+    :return: list of messages for the benchmarks slower than their baseline by more than their threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        threshold = reference.get("threshold", DEFAULT_THRESHOLD)
+        if result["opsPerSec"] < reference["opsPerSec"] * (1 - threshold):
+            regressions.append(f"{name}: {result['opsPerSec']:.0f} ops/s, baseline {reference['opsPerSec']:.0f} "
+                               f"ops/s (allowed drop {threshold:.0%})")
+    return regressions
+
+
+def main():
+    """
+    Runs the benchmarks from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the engine, computer intelligence and rendering.")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--only", nargs="*", help="names (or name prefixes) of the benchmarks to run")
+    parser.add_argument("--samples", type=int, default=300, help="timed samples per benchmark")
+    args = parser.parse_args()
+
+    benchmarks = engineBenchmarks() + renderBenchmarks() + startupBenchmarks()
+    if args.only:
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark.name.startswith(tuple(args.only))]
+    results = {}
+    print(f"{'benchmark':24} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10} {'bytes/call':>11}")
+    for benchmark in benchmarks:
+        result = benchmark.run(args.samples)
+        result["threshold"] = benchmark.threshold
+        results[benchmark.name] = result
+        print(f"{benchmark.name:24} {result['opsPerSec']:12.0f} {result['p50ns'] / 1000:10.2f} "
+              f"{result['p99ns'] / 1000:10.2f} {result['allocBytes']:11.0f}")
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file))
+        for message in regressions:
+            print("REGRESSION " + message)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Opening book and endgame cache of the computer. The known state of the board (the cells that cannot hold a remaining
+ship, the hits not yet part of a sunk ship and the sunk ships) is reduced to a canonical key by trying every symmetry of
+the board and keeping the smallest image, so rotated and mirrored positions share one entry. The keys map to moves in a
+size bounded least recently used cache that is saved to a file between runs.
+
+Moves come from three places, in order: the cache, an exact solver that enumerates every fleet consistent with the
+known state once few cells are left, and the probability density heat map. Solver moves are always cached, density
+moves only during the opening, where a deterministic book keeps the positions few and repeated.
+
+Book file layout:
+    header      18 bytes   magic b"BSMB", version, rows, cols, key size (uint16 each), fingerprint of the ships (uint32)
+    entries     key size + 4 bytes each, least recently used first: the key and the move (int32), the canonical cell
+                number or -1 for "ask the heat map"
+
+Usage: python book.py FILE [--games N] [--seed N]
+"""
+import argparse
+import os
+import random
+import struct
+import zlib
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+from density import DensityShooter
+from engine import DEFAULT_BOARD, BattleshipEngine, HuntShooter
+from fleetgen import FleetGenerator, placementTable
+
+
+MAGIC = b"BSMB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHI")
+MOVE = struct.Struct("<i")
+MAX_BOOK_CELLS = 400        # Largest board with symmetry tables
+DEFAULT_CAPACITY = 200000   # Entries kept in a book
+OPENING_SHOTS = 6           # Heat map moves are cached for the first shots of a game
+SOLVER_CELLS = 60           # The exact solver is tried once at most this many cells are unknown
+SOLVER_LIMIT = 100000       # Placements the exact solver may try before it gives up
+NO_MOVE = -1                # Cached when the solver gave up, so the heat map is asked without solving again
+
+
+@lru_cache(maxsize=None)
+def symmetries(rows, cols):
+    """
+    Every symmetry of the board: 8 for a square board (rotations and mirrors), 4 otherwise.
+    :return: tuple of (tables, image, inverse) for every symmetry. tables[i][value] is the image of byte i of a grid
+    holding value, so a grid is transformed with one lookup per byte. image[cell] is the image of a cell and
+    inverse[cell] the cell whose image is cell.
+    """
+    maps = [lambda r, c: (r, c), lambda r, c: (r, cols - 1 - c), lambda r, c: (rows - 1 - r, c),
+            lambda r, c: (rows - 1 - r, cols - 1 - c)]
+    if rows == cols:
+        maps += [lambda r, c: (c, r), lambda r, c: (c, rows - 1 - r), lambda r, c: (cols - 1 - c, r),
+                 lambda r, c: (cols - 1 - c, rows - 1 - r)]
+    cells = rows * cols
+    result = []
+    for transform in maps:
+        image = [0] * cells
+        for cell in range(cells):
+            row, col = transform(*divmod(cell, cols))
+            image[cell] = row * cols + col
+        inverse = [0] * cells
+        for cell, target in enumerate(image):
+            inverse[target] = cell
+        tables = []
+        for start in range(0, cells, 8):
+            table = [0] * 256
+            for value in range(1, 256):
+                low = value & -value
+                bit = low.bit_length() - 1
+                table[value] = table[value ^ low] | (1 << image[start + bit] if start + bit < cells else 0)
+            tables.append(tuple(table))
+        result.append((tuple(tables), tuple(image), tuple(inverse)))
+    return tuple(result)
+
+
+def transformGrid(bits, tables, size):
+    """
+    :param bits: grid packed into an integer, cell number n being bit n
+    :param tables: byte tables of one symmetry
+    :param size: number of bytes of a grid
+    :return: the image of the grid
+    """
+    image = 0
+    for table, value in zip(tables, bits.to_bytes(size, "little")):
+        if value:
+            image |= table[value]
+    return image
+
+
+def solve(blocked, hits, sizes, rows, cols, limit=SOLVER_LIMIT):
+    """
+    Exact solver. Enumerates every fleet of the remaining ships that covers no blocked cell and every hit, and counts
+    for every cell the fleets that cover it.
+    :param blocked: grid of the cells that cannot hold a remaining ship (misses and sunk ships)
+    :param hits: grid of the hits that are not part of a sunk ship
+    :param sizes: sizes of the remaining ships
+    :param limit: number of placements tried before giving up
+    :return: number of the unknown cell covered by the most fleets (the lowest one on ties), or None if no fleet fits
+    or the limit was reached
+    """
+    sizes = sorted(sizes, reverse=True)
+    # A remaining ship lying only on open hits would have been sunk by them
+    options = [[bits for bits, cells in placementTable(size, rows, cols) if not bits & blocked and bits & ~hits]
+               for size in sizes]
+    units = [sum(sizes[i:]) for i in range(len(sizes) + 1)]     # Units left to place from ship i on
+    fleets = []
+    budget = [limit]
+
+    def place(ship, occupied, first):
+        if ship == len(sizes):
+            if occupied & hits == hits:
+                fleets.append(occupied)
+            return
+        if (hits & ~occupied).bit_count() > units[ship]:        # The hits left cannot all be covered
+            return
+        start = first if ship and sizes[ship] == sizes[ship - 1] else 0     # Ships of one size in increasing order
+        for number in range(start, len(options[ship])):
+            bits = options[ship][number]
+            if not bits & occupied:
+                budget[0] -= 1
+                if budget[0] < 0:
+                    return
+                place(ship + 1, occupied | bits, number + 1)
+
+    place(0, 0, 0)
+    if budget[0] < 0 or not fleets:
+        return None
+    counts = Counter()
+    unknown = ~(blocked | hits)
+    for fleet in fleets:
+        bits = fleet & unknown
+        while bits:
+            low = bits & -bits
+            counts[low.bit_length() - 1] += 1
+            bits ^= low
+    if not counts:
+        return None
+    best = max(counts.values())
+    return min(cell for cell, count in counts.items() if count == best)
+
+
+class MoveBook:
+    """
+    Size bounded least recently used map from canonical keys to moves. It is read from its file when made and written
+    back by save, or when used as a context manager, on exit.
+    """
+    def __init__(self, filename=None, board=DEFAULT_BOARD, capacity=DEFAULT_CAPACITY):
+        """
+        :param filename: book file, None for a book that only lives in memory
+        :param board: BoardConfig the book is for
+        :param capacity: number of entries kept. The least recently used entries are dropped first.
+        """
+        self._filename = filename
+        self._capacity = capacity
+        self._keySize = 2 * ((board.cells + 7) // 8) + 2 * len(set(board.sizes.values()))
+        self._header = HEADER.pack(MAGIC, VERSION, board.rows, board.cols, self._keySize,
+                                   zlib.crc32(repr(board.ships).encode()))
+        self._entries = OrderedDict()
+        self._added = {}        # Entries put since the book was loaded, saved or taken from, see takeAdded
+        self.found = 0      # Lookups answered
+        self.missed = 0     # Lookups not answered
+        if filename is not None and os.path.exists(filename):
+            self._load()
+
+    def _load(self):
+        with open(self._filename, "rb") as file:
+            data = file.read()
+        if data[:HEADER.size] != self._header:
+            raise ValueError(f"{self._filename} is not a version {VERSION} book for this board")
+        record = self._keySize + MOVE.size
+        start = max(HEADER.size, len(data) - record * self._capacity)        # Only the most recent entries fit
+        start -= (start - HEADER.size) % record
+        for offset in range(start, len(data) - record + 1, record):
+            self._entries[data[offset:offset + self._keySize]] = MOVE.unpack_from(data, offset + self._keySize)[0]
+
+    def get(self, key):
+        """
+        :return: the move stored for the key, or None
+        """
+        move = self._entries.get(key)
+        if move is None:
+            self.missed += 1
+            return None
+        self._entries.move_to_end(key)
+        self.found += 1
+        return move
+
+    def put(self, key, move):
+        self._entries[key] = move
+        self._entries.move_to_end(key)
+        self._added[key] = move
+        if len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def takeAdded(self):
+        """
+        :return: list of the (key, move) entries put since the book was loaded, saved or last taken from, so that the
+        books of several processes can be merged into one with put
+        """
+        added = list(self._added.items())
+        self._added.clear()
+        return added
+
+    def save(self):
+        """
+        Writes the book to its file, least recently used entry first. The file is replaced in one step, so an
+        interrupted save never leaves a broken book.
+        """
+        if self._filename is None:
+            return
+        temporary = self._filename + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(self._header)
+            for key, move in self._entries.items():
+                file.write(key + MOVE.pack(move))
+        os.replace(temporary, self._filename)
+        self._added.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+
+@lru_cache(maxsize=None)
+def openBook(filename=None, board=DEFAULT_BOARD):
+    """
+    :return: the MoveBook of the file shared by every shooter of this process, so that the games of a tournament worker
+    all fill and use one book
+    """
+    return MoveBook(filename, board)
+
+
+class BookShooter(DensityShooter):
+    """
+    DensityShooter that asks a MoveBook first and solves the end of the game exactly. Sunk ships leave the remaining
+    fleet and their cells become blocked.
+    """
+    def __init__(self, rng=random, board=DEFAULT_BOARD, book=None):
+        """
+        :param rng: random number generator used to break ties of the heat map
+        :param board: BoardConfig of the board shot at, of at most MAX_BOOK_CELLS cells
+        :param book: MoveBook shared by the games. Defaults to the book in memory of the process, see openBook
+        """
+        if board.cells > MAX_BOOK_CELLS:
+            raise ValueError(f"books are for boards of up to {MAX_BOOK_CELLS} cells")
+        super().__init__(rng, board)
+        self._book = book if book is not None else openBook(None, board)
+        self._symmetries = symmetries(board.rows, board.cols)
+        self._gridSize = (board.cells + 7) // 8
+        self._shipSizes = sorted(set(board.sizes.values()))
+        self._remaining = Counter(size for name, size in board.ships)     # Size -> ships not sunk yet
+        self._blocked = 0       # Misses and sunk ships
+        self._open = 0          # Hits that are not part of a sunk ship
+        self._shots = 0
+
+    def canonical(self):
+        """
+        :return: (key, blocked, hits, symmetry) where blocked and hits are the smallest image of the known state over
+        the symmetries of the board, symmetry the (tables, image, inverse) that made it and key the bytes of the image
+        and of the remaining ships
+        """
+        best = None
+        for symmetry in self._symmetries:
+            tables = symmetry[0]
+            grids = (transformGrid(self._blocked, tables, self._gridSize), transformGrid(self._open, tables, self._gridSize))
+            if best is None or grids < best[0]:
+                best = (grids, symmetry)
+        (blocked, hits), symmetry = best
+        key = (blocked.to_bytes(self._gridSize, "little") + hits.to_bytes(self._gridSize, "little")
+               + b"".join(self._remaining[size].to_bytes(2, "little") for size in self._shipSizes))
+        return key, blocked, hits, symmetry
+
+    def nextShot(self):
+        """
+        :return: (row, col) of the next shot. The cell is recorded as visited.
+        """
+        endgame = self._cols * self._rows - (self._blocked | self._open).bit_count() <= SOLVER_CELLS
+        if endgame or self._shots < OPENING_SHOTS:      # Nothing is stored for the middle of the game
+            key, blocked, hits, (tables, image, inverse) = self.canonical()
+            move = self._book.get(key)
+        else:
+            move = NO_MOVE
+        if move is None:
+            if endgame:
+                solved = solve(blocked, hits, list(self._remaining.elements()), self._rows, self._cols)
+                move = solved if solved is not None else NO_MOVE
+                self._book.put(key, move)
+            else:
+                choices = self.bestCells()
+                move = image[choices[self._rng.randint(0, len(choices) - 1)]]
+                self._book.put(key, move)
+        if move == NO_MOVE:
+            choices = self.bestCells()
+            cell = choices[self._rng.randint(0, len(choices) - 1)]
+        else:
+            cell = inverse[move]
+        self._visited[cell] = 1
+        return cell // self._cols + 1, cell % self._cols + 1
+
+    def recordResult(self, row, col, hit):
+        super().recordResult(row, col, hit)
+        bit = 1 << (row - 1) * self._cols + col - 1
+        if hit:
+            self._open |= bit
+        else:
+            self._blocked |= bit
+        self._shots += 1
+
+    def recordSunk(self, cells):
+        """
+        Tells the shooter that a ship was sunk. BattleshipEngine calls it after the shot that sank the ship, for the
+        computer and for the player shooter of playGame.
+        :param cells: the (row, col) cells of the ship
+        """
+        super().recordSunk(cells)
+        bits = 0
+        for row, col in cells:
+            bits |= 1 << (row - 1) * self._cols + col - 1
+        self._open &= ~bits
+        self._blocked |= bits
+        self._remaining[len(cells)] -= 1
+
+
+def main():
+    """
+    Fills a book file by playing games of the book against the hunt/target intelligence.
+    """
+    parser = argparse.ArgumentParser(description="Fill a move book by playing games against the hunt intelligence.")
+    parser.add_argument("book", help="book file, made if it does not exist")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    generator = FleetGenerator(rng.random())
+    turns = 0
+    with MoveBook(args.book) as book:
+        for i in range(args.games):
+            engine = BattleshipEngine(rng, BookShooter(rng, book=book))
+            engine.setFleets(generator.sample(), generator.sample())
+            turns += engine.playGame(HuntShooter(rng))[1]
+        print(f"{args.games} games, {turns / args.games:.1f} turns on average, {len(book)} book entries, "
+              f"{book.found / max(1, book.found + book.missed):.1%} of the lookups answered")
+
+
+if __name__ == "__main__":
+    main()
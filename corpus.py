@@ -0,0 +1,166 @@
+"""
+Compact binary file of fleet layouts, read through a memory map.
+
+File layout (little endian):
+    header  16 bytes   magic b"BSFC", version (uint16), record size (uint16), number of records (uint64)
+    records 32 bytes   occupancy bits (16 bytes, same bit layout as Player), then for every ship of SHIPS in order its
+                       start row, start column and orientation (0 = "h", 1 = "v") as single bytes, then 1 padding byte
+
+Usage: python corpus.py input.json [input.json ...] output.bsfc
+"""
+import argparse
+import mmap
+import struct
+
+from fleet import SHIPS, CompiledFleet, loadFleetLibrary
+
+
+MAGIC = b"BSFC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+RECORD_SIZE = 32
+OCCUPANCY_SIZE = 16
+SHIP_NAMES = tuple(SHIPS)       # Order of the ships inside a record
+
+
+def encodeFleet(fleet):
+    """
+    :param fleet: CompiledFleet with one ship of every type in SHIPS
+    :return: the 32 byte record of the fleet
+    """
+    record = bytearray(RECORD_SIZE)
+    record[:OCCUPANCY_SIZE] = fleet.getBits().to_bytes(OCCUPANCY_SIZE, "little")
+    ships = {fleet.getName(ship): fleet.getCells(ship) for ship in range(len(fleet))}
+    for number, name in enumerate(SHIP_NAMES):
+        cells = ships[name]
+        (row, col), vertical = cells[0], len(cells) > 1 and cells[1][1] == cells[0][1]
+        offset = OCCUPANCY_SIZE + 3 * number
+        record[offset:offset + 3] = bytes((row, col, int(vertical)))
+    return bytes(record)
+
+
+def decodeFleet(record):
+    """
+    :param record: 32 bytes (bytes, or a memoryview into the corpus)
+    :return: the CompiledFleet stored in the record
+    """
+    cells = []
+    for number, name in enumerate(SHIP_NAMES):
+        offset = OCCUPANCY_SIZE + 3 * number
+        row, col, vertical = record[offset], record[offset + 1], record[offset + 2]
+        size = SHIPS[name]
+        if vertical:
+            cells.append([(i, col) for i in range(row, row + size)])
+        else:
+            cells.append([(row, i) for i in range(col, col + size)])
+    return CompiledFleet(SHIP_NAMES, cells)
+
+
+def writeCorpus(filename, fleets):
+    """
+    :param filename: output file
+    :param fleets: iterable of CompiledFleets
+    :return: number of records written
+    """
+    count = 0
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0))
+        for fleet in fleets:
+            file.write(encodeFleet(fleet))
+            count += 1
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, count))       # The count is only known at the end
+    return count
+
+
+def convertJson(filenames, output):
+    """
+    Converts fleet files in the usrData.json format (one game or a list of games) into a corpus. Both the playerShips
+    and the enemyShips fleet of every valid game are written.
+    :return: (number of records written, list of errors for the games that were skipped)
+    """
+    errors = []
+
+    def fleets():
+        for filename in filenames:
+            games, fileErrors = loadFleetLibrary(filename)
+            errors.extend(f"{filename}: {error}" for error in fileErrors)
+            for playerFleet, enemyFleet in games:
+                yield playerFleet
+                yield enemyFleet
+
+    return writeCorpus(output, fleets()), errors
+
+
+class FleetCorpus:
+    """
+    Read only access to a corpus file. The file is memory mapped, so opening it does not read the records, and every
+    record can be reached in O(1) as a memoryview without copying. Can be used as a context manager.
+    """
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, recordSize, count = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION or recordSize != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{filename} is not a version {VERSION} fleet corpus")
+        if HEADER.size + count * RECORD_SIZE > len(self._view):
+            self.close()
+            raise ValueError(f"{filename} is truncated")
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def getRecord(self, index):
+        """
+        :return: memoryview of the 32 byte record, pointing into the mapped file. It must be released (or dropped)
+        before the corpus is closed.
+        """
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start = HEADER.size + index * RECORD_SIZE
+        return self._view[start:start + RECORD_SIZE]
+
+    def getBits(self, index):
+        """
+        :return: occupancy bits of a fleet, without decoding the ships
+        """
+        return int.from_bytes(self.getRecord(index)[:OCCUPANCY_SIZE], "little")
+
+    def __getitem__(self, index):
+        return decodeFleet(self.getRecord(index))
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    """
+    Converts JSON fleet files into a corpus from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Convert usrData.json style fleet files into a binary fleet corpus.")
+    parser.add_argument("inputs", nargs="+", help="JSON fleet files")
+    parser.add_argument("output", help="corpus file to write")
+    args = parser.parse_args()
+    count, errors = convertJson(args.inputs, args.output)
+    for error in errors:
+        print(error)
+    print(f"Wrote {count} fleets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Probability density computer player. Every cell is scored by the number of ways the ships could still be placed over
+it, and the computer shoots the unvisited cell with the highest score.
+"""
+import random
+from collections import Counter
+
+from engine import DEFAULT_BOARD
+from fleet import placementIndex
+
+
+HIT_WEIGHT = 100        # A placement through a known hit outweighs any number of placements in open water
+
+
+class DensityShooter:
+    """
+    Keeps a heat map with, for each cell, the number of placements of the remaining ships that cover it and do not
+    cover a miss, plus a second map counting the hits inside those placements. Placements are never enumerated again:
+    a miss only removes the placements through that cell, and a hit only adds to the placements through that cell.
+    """
+    def __init__(self, rng=random, board=DEFAULT_BOARD):
+        """
+        :param rng: random number generator used to break ties
+        :param board: BoardConfig with the size of the board and the ships of the fleet. Every shot scans the whole
+        board, so this shooter is meant for boards of up to a few hundred rows and columns.
+        """
+        self._rng = rng
+        self._rows = board.rows
+        self._cols = board.cols
+        self._visited = bytearray(board.cells)      # 1 for the cells already guessed
+        self._sizes = Counter(size for name, size in board.ships)     # Number of remaining ships of every size
+        self._valid = {size: [True] * len(self._placements(size)[0]) for size in self._sizes}
+        self._hits = set()
+        self._heat = [0] * board.cells
+        self._hitHeat = [0] * board.cells
+        for size, count in self._sizes.items():
+            for cells in self._placements(size)[0]:
+                for cell in cells:
+                    self._heat[cell] += count
+
+    def _placements(self, size):
+        return placementIndex(size, self._rows, self._cols)
+
+    def getHeat(self, row, col):
+        """
+        :return: score of the cell. Higher scores are shot first.
+        """
+        cell = (row - 1) * self._cols + col - 1
+        return self._heat[cell] + HIT_WEIGHT * self._hitHeat[cell]
+
+    def bestCells(self):
+        """
+        :return: list of the numbers of the unvisited cells with the highest score, cell (row, col) being number
+        (row - 1) * cols + (col - 1)
+        """
+        heat = self._heat
+        hitHeat = self._hitHeat
+        visited = self._visited
+        best = -1
+        choices = []
+        for cell in range(len(visited)):
+            if visited[cell]:
+                continue
+            score = heat[cell] + HIT_WEIGHT * hitHeat[cell]
+            if score > best:
+                best = score
+                choices = [cell]
+            elif score == best:
+                choices.append(cell)
+        return choices
+
+    def nextShot(self):
+        """
+        :return: (row, col) of the unvisited cell with the highest score. The cell is recorded as visited.
+        """
+        choices = self.bestCells()
+        cell = choices[self._rng.randint(0, len(choices) - 1)]
+        self._visited[cell] = 1
+        return cell // self._cols + 1, cell % self._cols + 1
+
+    def recordResult(self, row, col, hit):
+        """
+        Updates the heat maps with the result of the last shot.
+        """
+        cell = (row - 1) * self._cols + col - 1
+        if hit:
+            self._hits.add(cell)
+            for size, count in self._sizes.items():
+                placements, covering = self._placements(size)
+                valid = self._valid[size]
+                for number in covering[cell]:
+                    if valid[number]:
+                        for covered in placements[number]:
+                            self._hitHeat[covered] += count
+        else:
+            for size, count in self._sizes.items():
+                placements, covering = self._placements(size)
+                valid = self._valid[size]
+                for number in covering[cell]:
+                    if valid[number]:
+                        valid[number] = False
+                        hits = sum(covered in self._hits for covered in placements[number])
+                        for covered in placements[number]:
+                            self._heat[covered] -= count
+                            self._hitHeat[covered] -= count * hits
+
+    def recordSunk(self, cells):
+        """
+        Drops a sunk ship from the remaining fleet. Its placements stop counting, and its cells block the remaining
+        ships like misses instead of drawing shots like hits.
+        :param cells: the (row, col) cells of the ship
+        """
+        size = len(cells)
+        sunk = [(row - 1) * self._cols + col - 1 for row, col in cells]
+        placements = self._placements(size)[0]
+        valid = self._valid[size]
+        for number, covered in enumerate(placements):       # One ship of this size less
+            if valid[number]:
+                hits = sum(cell in self._hits for cell in covered)
+                for cell in covered:
+                    self._heat[cell] -= 1
+                    self._hitHeat[cell] -= hits
+        self._sizes[size] -= 1
+        if self._sizes[size] == 0:
+            del self._sizes[size]
+        for cell in sunk:
+            for size, count in self._sizes.items():
+                placements, covering = self._placements(size)
+                valid = self._valid[size]
+                for number in covering[cell]:
+                    if valid[number]:
+                        valid[number] = False
+                        hits = sum(covered in self._hits for covered in placements[number])
+                        for covered in placements[number]:
+                            self._heat[covered] -= count
+                            self._hitHeat[covered] -= count * hits
+        self._hits.difference_update(sunk)
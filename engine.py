@@ -0,0 +1,578 @@
+import json
+import random
+
+from fleet import DEFAULT_BOARD, FLEET_UNITS, compileFleet, compileGame, letterSwitch, rowName
+from fleetgen import FleetGenerator
+
+
+CELL_BITS = [[1 << ((row - 1) * 10 + col - 1) if row and col else 0 for col in range(11)] for row in range(11)]     # CELL_BITS[row][col] is the bit of that cell
+
+
+class Player:
+    """
+    Holds a 10x10 grid of boolean values (all false initially), packed into the bits of a single integer.
+    Cell (row, col) is bit (row - 1) * 10 + (col - 1), with rows and columns starting at 1.
+    The functions provided allow the class user to toggle the boolean value and see if it is set to True
+    The function isAllFalse tests whether there are any True values in the grid.
+    Grids can be combined with & and |, counted with count() and iterated over to get the True cells.
+    """
+    def __init__(self, bits=0):
+        self._bits = bits
+
+    def isTrue(self, row, col):
+        """
+        :param row: integer - row value
+        :param col: integer - column value
+        :return: True if the corresponding cell is True
+        """
+        return self._bits & CELL_BITS[row][col] != 0
+
+    def makeTrue(self, row, col):
+        self._bits |= CELL_BITS[row][col]
+
+    def makeFalse(self, row, col):
+        self._bits &= ~CELL_BITS[row][col]
+
+    def isAllFalse(self):
+        return self._bits == 0
+
+    def getBits(self):
+        return self._bits
+
+    def count(self):
+        """
+        :return: number of True cells
+        """
+        return self._bits.bit_count()
+
+    def __and__(self, other):
+        return Player(self._bits & other._bits)
+
+    def __or__(self, other):
+        return Player(self._bits | other._bits)
+
+    def __eq__(self, other):
+        return isinstance(other, Player) and self._bits == other._bits
+
+    def __iter__(self):
+        """
+        Yields the (row, col) of every True cell, in row order.
+        """
+        bits = self._bits
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            yield index // 10 + 1, index % 10 + 1
+            bits ^= low
+
+
+class SparseGrid:
+    """
+    Grid of boolean values for boards of any size, with the same methods as Player. Only the True cells are kept, as
+    the cell numbers (row - 1) * cols + (col - 1) in a set, so memory and iteration grow with the number of True cells
+    instead of the size of the board, and setting a cell never copies the grid.
+    """
+    def __init__(self, cols, cells=()):
+        """
+        :param cols: number of columns of the board
+        :param cells: cell numbers that start True
+        """
+        self._cols = cols
+        self._cells = set(cells)
+
+    def isTrue(self, row, col):
+        return (row - 1) * self._cols + col - 1 in self._cells
+
+    def makeTrue(self, row, col):
+        self._cells.add((row - 1) * self._cols + col - 1)
+
+    def makeFalse(self, row, col):
+        self._cells.discard((row - 1) * self._cols + col - 1)
+
+    def isAllFalse(self):
+        return not self._cells
+
+    def getBits(self):
+        """
+        :return: the True cells as the bits of an integer, cell number n being bit n
+        """
+        packed = bytearray(max(self._cells, default=0) // 8 + 1)
+        for index in self._cells:
+            packed[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(packed, "little")
+
+    def count(self):
+        return len(self._cells)
+
+    def __and__(self, other):
+        return SparseGrid(self._cols, self._cells & other._cells)
+
+    def __or__(self, other):
+        return SparseGrid(self._cols, self._cells | other._cells)
+
+    def __eq__(self, other):
+        return isinstance(other, SparseGrid) and self._cols == other._cols and self._cells == other._cells
+
+    def __iter__(self):
+        """
+        Yields the (row, col) of every True cell, in row order.
+        """
+        for index in sorted(self._cells):
+            yield index // self._cols + 1, index % self._cols + 1
+
+
+def makeGrid(board=DEFAULT_BOARD, cells=()):
+    """
+    :param board: BoardConfig of the grid
+    :param cells: (row, col) cells that start True
+    :return: a Player on the 10x10 board, where packing the cells into an integer is fastest, a SparseGrid otherwise
+    """
+    grid = Player() if board.isClassic() else SparseGrid(board.cols)
+    for row, col in cells:
+        grid.makeTrue(row, col)
+    return grid
+
+
+def parseShot(inputString, board=DEFAULT_BOARD):
+    """
+    :param inputString: a shot written as "letter,number", for example "A,5". Boards with more than 26 rows use two
+    letters or more after Z, for example "AB,120"
+    :param board: BoardConfig the shot must be inside of
+    :return: (row, col) tuple with values starting from 1, or None if the string is not a valid shot
+    """
+    inputList = inputString.split(",")
+    if len(inputList) != 2:
+        return None
+    letter = inputList[0].strip().upper()
+    number = inputList[1].strip()
+    try:
+        row = letterSwitch(letter)
+    except KeyError:
+        return None
+    if not 1 <= row <= board.rows:      # Validate that the correct letter is received
+        return None
+    if not (number.isascii() and number.isdigit()) or not 1 <= int(number) <= board.cols:     # int rejects digits like ²
+        return None
+    return row, int(number)
+
+
+def loadFleetData(filename="usrData.json"):
+    """
+    :param filename: JSON file containing the "playerShips" and "enemyShips" lists
+    :return: the parsed fleet data
+    """
+    with open(filename) as file:
+        return json.load(file)
+
+
+class CellSet:
+    """
+    Set of (row, col) cells with O(1) add, remove and uniform random choice. The cells are kept in a list and the
+    position of every cell in a dictionary, so a removed cell is replaced by the last one in the list.
+    """
+    def __init__(self, cells=()):
+        self._cells = []
+        self._index = {}
+        for cell in cells:
+            self.add(cell)
+
+    def add(self, cell):
+        if cell not in self._index:
+            self._index[cell] = len(self._cells)
+            self._cells.append(cell)
+
+    def remove(self, cell):
+        position = self._index.pop(cell, None)
+        if position is None:
+            return
+        last = self._cells.pop()
+        if position < len(self._cells):     # Move the last cell into the gap
+            self._cells[position] = last
+            self._index[last] = position
+
+    def choice(self, rng):
+        """
+        :param rng: random number generator (anything with randint)
+        :return: a uniformly random cell of the set, which must not be empty
+        """
+        return self._cells[rng.randint(0, len(self._cells) - 1)]
+
+    def __contains__(self, cell):
+        return cell in self._index
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __iter__(self):
+        return iter(self._cells)
+
+
+class FreeCellSet:
+    """
+    The cells of a board that were not removed yet, with O(1) remove and uniform random choice. Works like a lazy
+    Fisher-Yates shuffle of the cell numbers: the first len(self) positions hold the cells left, and only the positions
+    whose cell was swapped are stored, so memory grows with the number of removed cells instead of the board size.
+    """
+    def __init__(self, rows=10, cols=10):
+        self._cols = cols
+        self._size = rows * cols
+        self._at = {}       # Position -> cell number, for the positions that do not hold their own number
+        self._where = {}    # Cell number -> position, the reverse of _at
+
+    def remove(self, cell):
+        if cell not in self:
+            return
+        number = (cell[0] - 1) * self._cols + cell[1] - 1
+        position = self._where.pop(number, number)
+        self._size -= 1
+        last = self._at.pop(self._size, self._size)        # Move the last cell into the gap
+        if position != self._size:
+            self._at[position] = last
+            self._where[last] = position
+
+    def choice(self, rng):
+        """
+        :param rng: random number generator (anything with randint)
+        :return: a uniformly random cell of the set, which must not be empty
+        """
+        position = rng.randint(0, self._size - 1)
+        number = self._at.get(position, position)
+        return number // self._cols + 1, number % self._cols + 1
+
+    def __contains__(self, cell):
+        number = (cell[0] - 1) * self._cols + cell[1] - 1
+        position = self._where.get(number, number)
+        return position < self._size and self._at.get(position, position) == number
+
+    def __len__(self):
+        return self._size
+
+
+class HuntShooter:
+    """
+    The built in computer intelligence. Guesses randomly from the cells it has not visited yet ("hunt") until a hit is
+    made, then shoots at the unvisited neighbours of its hits ("target") until none are left. When a ship sinks, the
+    targets that were only next to that ship are dropped.
+    The unvisited cells and the target cells are also kept in sets with O(1) choice, so every shot takes the same time
+    no matter how many cells are left or how large the board is.
+    """
+    def __init__(self, rng=random, board=DEFAULT_BOARD):
+        """
+        :param rng: random number generator (anything with randint)
+        :param board: BoardConfig of the board shot at
+        """
+        self._rng = rng
+        self._rows = board.rows
+        self._cols = board.cols
+        self._attempts = makeGrid(board)        # Cells already guessed
+        self._potentials = makeGrid(board)      # Unvisited neighbours of hits
+        self._remaining = FreeCellSet(board.rows, board.cols)
+        self._targets = CellSet()
+        self._hits = set()      # Hits that are not part of a sunk ship
+
+    def getPotentials(self):
+        """
+        :return: grid of the target cells, the unvisited neighbours of the hits on ships still afloat
+        """
+        return self._potentials
+
+    def changePotentials(self, row, col):
+        """
+        If a cell is hit, then all the surrounding cells will be made true in the potentials array, only if the cell
+        has not already been visited.
+        :param row: number from 1 to the number of rows
+        :param col: number from 1 to the number of columns
+        """
+        rows, cols = self._rows, self._cols
+        for nRow, nCol in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+            if 1 <= nRow <= rows and 1 <= nCol <= cols and not self._attempts.isTrue(nRow, nCol):
+                self._potentials.makeTrue(nRow, nCol)
+                self._targets.add((nRow, nCol))
+
+    def nextShot(self):
+        """
+        :return: (row, col) of the next shot. The cell is recorded as visited.
+        """
+        if len(self._targets) == 0:       # If there are no potentials, play randomly
+            rowVal, colVal = self._remaining.choice(self._rng)
+        else:
+            rowVal, colVal = self._targets.choice(self._rng)      # Playing intelligently
+            self._targets.remove((rowVal, colVal))
+            self._potentials.makeFalse(rowVal, colVal)      # Remove from array of potentials.
+        self._remaining.remove((rowVal, colVal))
+        self._attempts.makeTrue(rowVal, colVal)     # Add to array of already guessed
+        return rowVal, colVal
+
+    def recordResult(self, row, col, hit):
+        """
+        Tells the shooter whether its last shot was a hit so the neighbouring cells can be targeted.
+        """
+        if hit:
+            self._hits.add((row, col))
+            self.changePotentials(row, col)
+
+    def recordSunk(self, cells):
+        """
+        Tells the shooter that a ship was sunk. The targets next to the ship are dropped, unless they are also next to
+        a hit of a ship that is still afloat.
+        :param cells: the (row, col) cells of the ship
+        """
+        hits = self._hits
+        hits.difference_update(cells)
+        for row, col in cells:
+            for target in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if target in self._targets:
+                    tRow, tCol = target
+                    if not any(cell in hits for cell in ((tRow - 1, tCol), (tRow + 1, tCol), (tRow, tCol - 1),
+                                                         (tRow, tCol + 1))):
+                        self._targets.remove(target)
+                        self._potentials.makeFalse(tRow, tCol)
+
+
+class RandomShooter:
+    """
+    Baseline computer player that ignores hits and shoots every cell once in a random order.
+    """
+    def __init__(self, rng=random, board=DEFAULT_BOARD):
+        self._rng = rng
+        self._remaining = FreeCellSet(board.rows, board.cols)
+
+    def nextShot(self):
+        cell = self._remaining.choice(self._rng)
+        self._remaining.remove(cell)
+        return cell
+
+    def recordResult(self, row, col, hit):
+        pass
+
+    def recordSunk(self, cells):
+        pass
+
+
+class BattleshipEngine:
+    """
+    Holds the state of one game without any display: both fleets, the shots made by each side, the remaining ship
+    units and the computer intelligence. Nothing in this module imports pygame, so it can be used for simulations.
+    Every ship has a hit counter, so a sinking is seen on the shot that makes it and announced to the shooters
+    (recordSunk) and to the sink listeners.
+    """
+    def __init__(self, rng=None, computer=None, seed=None, recorder=None, board=DEFAULT_BOARD):
+        """
+        :param rng: random number generator used by the computer (anything with randint). Defaults to a random.Random
+        made from the seed
+        :param computer: shooter used for the computer turns. Defaults to a HuntShooter
+        :param seed: seed of the game, written to the recorder. A random one is picked if not given
+        :param recorder: optional move log (for example a replay.MoveLogWriter) that every shot is sent to. Move logs
+        only hold games on the 10x10 board. A recorded game given its own rng must also be given the seed that rng was
+        made from, otherwise ValueError is raised: the logged seed would not be the one the game was played with.
+        :param board: BoardConfig of the game
+        """
+        if recorder is not None and rng is not None and seed is None:
+            raise ValueError("a recorded game with its own rng needs the seed of that rng")
+        self._seed = seed if seed is not None else random.getrandbits(63)
+        self._rng = rng if rng is not None else random.Random(self._seed)
+        self._recorder = recorder
+        self._board = board
+        self._user = makeGrid(board)            # Player fleet
+        self._computer = makeGrid(board)        # Computer fleet
+        self._userFleet = None          # CompiledFleets of both players, set by setFleets
+        self._computerFleet = None
+        self._playerAttempts = makeGrid(board)
+        self._computerAttempts = makeGrid(board)
+        self._ai = computer if computer is not None else HuntShooter(self._rng, board)
+        self._playerCount = board.units     # Initialize ship counts for each user
+        self._computerCount = board.units
+        self._userHits = []         # Hits on every ship of each fleet, set by setFleets
+        self._computerHits = []
+        self._lastSunk = None       # Cells of the ship sunk by the last shot
+        self._listeners = []
+        self._turns = 0
+
+    def setFleets(self, playerFleet, enemyFleet):
+        """
+        :param playerFleet: CompiledFleet of the player
+        :param enemyFleet: CompiledFleet of the computer
+        """
+        self._userFleet = playerFleet
+        self._computerFleet = enemyFleet
+        self._user = makeGrid(self._board, playerFleet.allCells())
+        self._computer = makeGrid(self._board, enemyFleet.allCells())
+        self._playerCount = len(playerFleet.allCells())
+        self._computerCount = len(enemyFleet.allCells())
+        self._userHits = [0] * len(playerFleet)
+        self._computerHits = [0] * len(enemyFleet)
+        if self._recorder is not None:
+            self._recorder.startGame(self._seed, playerFleet, enemyFleet)
+
+    def loadFleets(self, data, enemyFleet=None):
+        """
+        :param data: dictionary in the usrData.json format
+        :param enemyFleet: CompiledFleet used for the computer instead of the enemyShips of the data, for example one
+        made by a FleetGenerator
+        :return: list of the cells covered by the player ships. Raises FleetError listing every problem of the fleets.
+        """
+        if enemyFleet is None:
+            playerFleet, enemyFleet = compileGame(data, board=self._board)
+        else:
+            playerFleet = compileFleet(data.get("playerShips"), "playerShips", self._board)
+        self.setFleets(playerFleet, enemyFleet)
+        return playerFleet.allCells()
+
+    def playerAttack(self, row, col):
+        """
+        :return: True for a hit, False for a miss, None if the cell was already guessed
+        """
+        if self._playerAttempts.isTrue(row, col):
+            return None
+        self._playerAttempts.makeTrue(row, col)
+        if self._recorder is not None:
+            self._recorder.recordShot(False, row, col)
+        self._lastSunk = None
+        ship = self._computerFleet.shipAt(row, col)
+        if ship >= 0:           # Test if a hit is made
+            self._computerCount -= 1        # Decrease the shipCount of the computer
+            self._computerHits[ship] += 1
+            if self._computerHits[ship] == self._computerFleet.getSize(ship):
+                self._sink("player", self._computerFleet, ship)
+            return True
+        return False
+
+    def computerAttack(self):
+        """
+        :return: (row, col, hit) of the shot made by the computer
+        """
+        rowVal, colVal = self._ai.nextShot()
+        self._computerAttempts.makeTrue(rowVal, colVal)
+        if self._recorder is not None:
+            self._recorder.recordShot(True, rowVal, colVal)
+        self._lastSunk = None
+        ship = self._userFleet.shipAt(rowVal, colVal)
+        hit = ship >= 0
+        if hit:
+            self._playerCount -= 1      # Decrease the player ship count
+            self._userHits[ship] += 1
+            if self._userHits[ship] == self._userFleet.getSize(ship):
+                self._sink("computer", self._userFleet, ship)
+        self._ai.recordResult(rowVal, colVal, hit)
+        if self._lastSunk is not None:
+            self._ai.recordSunk(self._lastSunk)
+        self._turns += 1
+        return rowVal, colVal, hit
+
+    def _sink(self, side, fleet, ship):
+        self._lastSunk = fleet.getCells(ship)
+        for listener in self._listeners:
+            listener(side, fleet, ship)
+
+    def addSinkListener(self, listener):
+        """
+        :param listener: function called with (side, fleet, ship) every time a ship sinks. side is "player" when the
+        player sank a computer ship and "computer" otherwise, fleet is the CompiledFleet of the ship and ship its number
+        in the fleet, so fleet.getName(ship) and fleet.getCells(ship) describe it.
+        """
+        self._listeners.append(listener)
+
+    def getLastSunk(self):
+        """
+        :return: list of the cells of the ship sunk by the last shot, or None if the last shot sank nothing
+        """
+        return self._lastSunk
+
+    def getShipsAfloat(self, side):
+        """
+        :param side: "player" or "computer"
+        :return: number of ships of that side not sunk yet
+        """
+        fleet, hits = (self._userFleet, self._userHits) if side == "player" else (self._computerFleet, self._computerHits)
+        return sum(1 for ship, count in enumerate(hits) if count < fleet.getSize(ship))
+
+    def winner(self):
+        """
+        :return: "computer" or "player" once one of the fleets is sunk, otherwise None. The computer wins a tie.
+        """
+        if self._playerCount == 0:
+            return "computer"
+        if self._computerCount == 0:
+            return "player"
+        return None
+
+    def getTurns(self):
+        return self._turns
+
+    def getSeed(self):
+        return self._seed
+
+    def getBoard(self):
+        return self._board
+
+    def getUserGrid(self):
+        """
+        :return: grid of the cells of the player ships. The grids returned by the getters are the ones of the engine
+        and must not be changed.
+        """
+        return self._user
+
+    def getComputerGrid(self):
+        """
+        :return: grid of the cells of the computer ships
+        """
+        return self._computer
+
+    def getPlayerAttempts(self):
+        """
+        :return: grid of the cells the player has shot at
+        """
+        return self._playerAttempts
+
+    def getComputerAttempts(self):
+        """
+        :return: grid of the cells the computer has shot at
+        """
+        return self._computerAttempts
+
+    def getUnits(self, side):
+        """
+        :param side: "player" or "computer"
+        :return: number of ship cells of that side not hit yet
+        """
+        return self._playerCount if side == "player" else self._computerCount
+
+    def playGame(self, player=None):
+        """
+        Plays the game until one fleet is sunk. Every turn the player shoots first and the computer answers.
+        :param player: shooter used for the player turns. Defaults to a HuntShooter
+        :return: (winner, turns)
+        """
+        player = player if player is not None else HuntShooter(self._rng, self._board)
+        while self.winner() is None:
+            row, col = player.nextShot()
+            player.recordResult(row, col, self.playerAttack(row, col))
+            if self._lastSunk is not None:
+                player.recordSunk(self._lastSunk)
+            self.computerAttack()
+        return self.winner(), self._turns
+
+
+def playGames(count, data, seed=None, recorder=None, board=DEFAULT_BOARD):
+    """
+    Plays full games between two computer players without any rendering.
+    :param count: number of games to play
+    :param data: fleet dictionary in the usrData.json format, used for every game. None to give both players new
+    random fleets every game.
+    :param seed: seed for the random number generator, so that a batch can be reproduced
+    :param recorder: optional move log that every game is written to
+    :param board: BoardConfig of the games
+    :return: list of (winner, turns) tuples, one per game
+    """
+    rng = random.Random(seed)
+    generator = FleetGenerator(rng.random(), board) if data is None else None
+    if data is not None:
+        playerFleet, enemyFleet = compileGame(data, board=board)       # Validate once for the whole batch
+    results = []
+    for i in range(count):
+        engine = BattleshipEngine(seed=rng.getrandbits(63), recorder=recorder, board=board)     # Every game can be replayed from its seed
+        if generator is not None:
+            playerFleet, enemyFleet = generator.sample(), generator.sample()
+        engine.setFleets(playerFleet, enemyFleet)
+        results.append(engine.playGame())
+    return results
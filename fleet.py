@@ -0,0 +1,322 @@
+"""
+Loading and validation of fleets. A fleet is checked as a whole, every problem is reported instead of only the first
+one, and a valid fleet is compiled into a CompiledFleet that answers "which ship is on this cell" in O(1).
+"""
+import json
+from collections import Counter
+from functools import lru_cache
+
+
+SHIPS = {"Carrier": 5, "Battleship": 4, "Cruiser": 3, "Submarine": 3, "Destroyer": 2}
+FLEET_UNITS = 17        # Total number of ship units in a fleet
+
+
+def letterSwitch(letter):
+    """
+    :param letter: Row letters from A to Z, followed by AA, AB and so on for boards with more than 26 rows
+    :return: Corresponding number in increasing order starting from A - 1. Raises KeyError for anything else.
+    """
+    if not letter:
+        raise KeyError(letter)
+    number = 0
+    for char in letter:
+        if not "A" <= char <= "Z":
+            raise KeyError(letter)
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def rowName(row):
+    """
+    :param row: row number, starting from 1
+    :return: the letters of the row, the reverse of letterSwitch
+    """
+    letters = ""
+    while row:
+        row, rest = divmod(row - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+class BoardConfig:
+    """
+    Size of the board and the ships of every fleet. The default is the classic 10x10 board with the ships of SHIPS.
+    A ship name may appear any number of times, so a fleet can hold hundreds of ships.
+    """
+    def __init__(self, rows=10, cols=10, ships=SHIPS):
+        """
+        :param rows: number of rows
+        :param cols: number of columns
+        :param ships: dictionary of ship names and sizes, or list of (name, size) pairs with one pair per ship
+        """
+        ships = tuple(ships.items()) if isinstance(ships, dict) else tuple((name, size) for name, size in ships)
+        if rows < 1 or cols < 1:
+            raise ValueError(f"board of {rows}x{cols} cells")
+        if not ships:
+            raise ValueError("a fleet needs at least one ship")
+        self.sizes = {}     # Name -> size
+        for name, size in ships:
+            if not 1 <= size <= max(rows, cols):
+                raise ValueError(f"{name} of size {size} does not fit a {rows}x{cols} board")
+            if self.sizes.setdefault(name, size) != size:
+                raise ValueError(f"{name} has two different sizes")
+        self.rows = rows
+        self.cols = cols
+        self.cells = rows * cols
+        self.ships = ships
+        self.counts = Counter(name for name, size in ships)      # Name -> number of ships with that name
+        self.units = sum(size for name, size in ships)
+        if self.units > self.cells:
+            raise ValueError(f"ships of {self.units} cells do not fit a {rows}x{cols} board of {self.cells} cells")
+
+    @classmethod
+    def parse(cls, board="10x10", ships=None):
+        """
+        Reads a board from command line options.
+        :param board: "ROWSxCOLS", for example "100x100"
+        :param ships: comma separated "NAME:SIZE" or "NAME:SIZExCOUNT" items, for example "Carrier:5x20,Destroyer:2x100".
+        None for the ships of SHIPS
+        :return: BoardConfig. Raises ValueError if the text is not valid.
+        """
+        try:
+            rows, cols = (int(value) for value in board.lower().split("x"))
+            fleet = SHIPS if ships is None else []
+            for item in ships.split(",") if ships is not None else ():
+                name, size = item.split(":")
+                size, count = size.split("x") if "x" in size else (size, 1)
+                fleet += [(name.strip(), int(size))] * int(count)
+        except ValueError:
+            raise ValueError(f"invalid board {board!r} or ships {ships!r}")
+        return cls(rows, cols, fleet)
+
+    def isClassic(self):
+        """
+        :return: True for the 10x10 board, where grids are packed into a Player. The fixed size formats (corpus, move
+        log, batch) only support this board with the ships of SHIPS.
+        """
+        return self.rows == 10 and self.cols == 10
+
+    def __eq__(self, other):
+        return isinstance(other, BoardConfig) and (self.rows, self.cols, self.ships) == (other.rows, other.cols, other.ships)
+
+    def __hash__(self):
+        return hash((self.rows, self.cols, self.ships))
+
+    def __repr__(self):
+        return f"BoardConfig({self.rows}, {self.cols}, {len(self.ships)} ships)"
+
+
+DEFAULT_BOARD = BoardConfig()
+
+
+class FleetError(ValueError):
+    """
+    Raised when a fleet is not valid. The errors attribute holds one message per problem found.
+    """
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class CompiledFleet:
+    """
+    A validated fleet. Holds, for every occupied cell, the number of the ship on it, so hit tests and ship lookups are a
+    single dictionary lookup. Only the occupied cells are stored, so large boards cost no more than small ones.
+    """
+    def __init__(self, names, cells, cols=10):
+        """
+        :param names: ship names, in the order of the ships
+        :param cells: for every ship, the list of (row, col) cells it covers
+        :param cols: number of columns of the board
+        """
+        self._names = list(names)
+        self._cells = [list(shipCells) for shipCells in cells]
+        self._cols = cols
+        self._shipAt = {}       # Cell number -> ship number
+        self._bits = None
+        for ship, shipCells in enumerate(self._cells):
+            for row, col in shipCells:
+                self._shipAt[(row - 1) * cols + col - 1] = ship
+
+    def getBits(self):
+        """
+        :return: the occupied cells as the bits of an integer, cell (row, col) being bit (row - 1) * cols + (col - 1)
+        (the Player layout on the 10x10 board). Made on the first call.
+        """
+        if self._bits is None:
+            packed = bytearray(max(self._shipAt, default=0) // 8 + 1)
+            for index in self._shipAt:
+                packed[index >> 3] |= 1 << (index & 7)
+            self._bits = int.from_bytes(packed, "little")
+        return self._bits
+
+    def getCols(self):
+        return self._cols
+
+    def shipAt(self, row, col):
+        """
+        :return: number of the ship on the cell, or -1 for open water
+        """
+        return self._shipAt.get((row - 1) * self._cols + col - 1, -1)
+
+    def getName(self, ship):
+        return self._names[ship]
+
+    def getSize(self, ship):
+        return len(self._cells[ship])
+
+    def getCells(self, ship):
+        return self._cells[ship]
+
+    def allCells(self):
+        """
+        :return: list of the (row, col) cells of every ship
+        """
+        return [cell for shipCells in self._cells for cell in shipCells]
+
+    def __len__(self):
+        return len(self._names)
+
+
+@lru_cache(maxsize=None)
+def placementIndex(size, rows=10, cols=10):
+    """
+    Precomputed placements of a ship on the board. Cells are numbered from 0 (0 to 99 on the 10x10 board), row by row.
+    The index holds every placement, so it is meant for boards of up to a few hundred rows and columns.
+    :param size: length of the ship
+    :return: (placements, covering) where placements is a tuple of cell tuples, one per horizontal or vertical
+    placement, and covering[cell] is the tuple of placement numbers that cover the cell
+    """
+    placements = []
+    for row in range(rows):
+        for col in range(cols):
+            if col + size <= cols:
+                placements.append(tuple(row * cols + col + i for i in range(size)))
+            if size > 1 and row + size <= rows:
+                placements.append(tuple((row + i) * cols + col for i in range(size)))
+    covering = [[] for cell in range(rows * cols)]
+    for number, cells in enumerate(placements):
+        for cell in cells:
+            covering[cell].append(number)
+    return tuple(placements), tuple(tuple(numbers) for numbers in covering)
+
+
+def validateFleet(ships, label="fleet", board=DEFAULT_BOARD):
+    """
+    Checks a whole fleet in one pass.
+    :param ships: list of ship dictionaries with "letterPos", "numberPos", "shipName" and "orientation"
+    :param label: name of the fleet used in the error messages
+    :param board: BoardConfig the fleet is placed on
+    :return: (fleet, errors). fleet is a CompiledFleet, or None if errors is not empty.
+    """
+    errors = []
+    if not isinstance(ships, list):
+        return None, [f"{label}: expected a list of ships"]
+    names = []
+    cells = []
+    occupied = {}       # Cell -> name of the ship on it
+    for number, ship in enumerate(ships):
+        where = f"{label} ship {number + 1}"
+        if not isinstance(ship, dict):
+            errors.append(f"{where}: expected an object")
+            continue
+        missing = [key for key in ("letterPos", "numberPos", "shipName", "orientation") if key not in ship]
+        if missing:
+            errors.append(f"{where}: missing {', '.join(missing)}")
+            continue
+        letter, column, name, orient = ship["letterPos"], ship["numberPos"], ship["shipName"], ship["orientation"]
+        valid = True
+        if not isinstance(name, str) or name not in board.sizes:
+            errors.append(f"{where}: unknown ship {name!r}")
+            valid = False
+        try:
+            row = letterSwitch(letter.upper())
+        except (AttributeError, KeyError):
+            row = 0
+        if not 1 <= row <= board.rows:
+            errors.append(f"{where}: row letter {letter!r} is not between A and {rowName(board.rows)}")
+            valid = False
+        if not isinstance(column, int) or isinstance(column, bool) or not 1 <= column <= board.cols:
+            errors.append(f"{where}: column {column!r} is not between 1 and {board.cols}")
+            valid = False
+        if orient not in ("h", "v"):
+            errors.append(f"{where}: orientation {orient!r} is not 'h' or 'v'")
+            valid = False
+        if not valid:
+            continue
+        size = board.sizes[name]
+        if orient == "h":
+            shipCells = [(row, i) for i in range(column, column + size)]
+        else:
+            shipCells = [(i, column) for i in range(row, row + size)]
+        if shipCells[-1][0] > board.rows or shipCells[-1][1] > board.cols:
+            errors.append(f"{where}: {name} at {letter.upper()},{column} is out of range")
+            continue
+        overlaps = sorted({occupied[cell] for cell in shipCells if cell in occupied})
+        if overlaps:
+            errors.append(f"{where}: {name} at {letter.upper()},{column} overlaps {', '.join(overlaps)}")
+            continue
+        for cell in shipCells:
+            occupied[cell] = name
+        names.append(name)
+        cells.append(shipCells)
+
+    placed = Counter(ship.get("shipName") for ship in ships       # Names that are not strings were reported above
+                     if isinstance(ship, dict) and isinstance(ship.get("shipName"), str))
+    for name, count in board.counts.items():
+        if placed[name] == 0:
+            errors.append(f"{label}: no {name}")
+        elif placed[name] != count:
+            errors.append(f"{label}: {placed[name]} ships named {name}" + (f", expected {count}" if count > 1 else ""))
+    if errors:
+        return None, errors
+    return CompiledFleet(names, cells, board.cols), []
+
+
+def compileFleet(ships, label="fleet", board=DEFAULT_BOARD):
+    """
+    :return: the CompiledFleet of the ships. Raises FleetError with every problem if the fleet is not valid.
+    """
+    fleet, errors = validateFleet(ships, label, board)
+    if errors:
+        raise FleetError(errors)
+    return fleet
+
+
+def compileGame(data, label="game", board=DEFAULT_BOARD):
+    """
+    :param data: dictionary in the usrData.json format
+    :param board: BoardConfig both fleets are placed on
+    :return: (playerFleet, enemyFleet). Raises FleetError with the problems of both fleets.
+    """
+    if not isinstance(data, dict):
+        raise FleetError([f"{label}: expected an object with playerShips and enemyShips"])
+    playerFleet, playerErrors = validateFleet(data.get("playerShips"), f"{label} playerShips", board)
+    enemyFleet, enemyErrors = validateFleet(data.get("enemyShips"), f"{label} enemyShips", board)
+    if playerErrors or enemyErrors:
+        raise FleetError(playerErrors + enemyErrors)
+    return playerFleet, enemyFleet
+
+
+def loadFleetLibrary(filename):
+    """
+    Loads a file that holds either one game in the usrData.json format or a list of them. Invalid games are skipped and
+    reported, they never stop the loading of the others.
+    :param filename: JSON file
+    :return: (games, errors) where games is a list of (playerFleet, enemyFleet) for every valid game and errors the
+    list of messages for the invalid ones
+    """
+    try:
+        with open(filename) as file:
+            data = json.load(file)
+    except (OSError, ValueError) as error:
+        return [], [f"{filename}: {error}"]
+    entries = data if isinstance(data, list) else [data]
+    games = []
+    errors = []
+    for number, entry in enumerate(entries):
+        try:
+            games.append(compileGame(entry, f"game {number + 1}" if isinstance(data, list) else "game"))
+        except FleetError as error:
+            errors += error.errors
+    return games, errors
@@ -0,0 +1,152 @@
+"""
+Random legal fleets. Every ship is given a placement drawn from a precomputed table, and the whole fleet is drawn again
+as soon as a ship overlaps one already placed. Restarting from the first ship (instead of only redrawing the ship that
+collided) keeps the fleets uniformly distributed over all legal fleets.
+
+The chance that a whole fleet fits falls exponentially with the number of ships, so after MAX_RESTARTS restarts the
+generator falls back to redrawing only the ship that collided, up to MAX_SHIP_DRAWS times per ship. Fleets drawn this
+way are legal but not exactly uniform: crowded layouts come up slightly more often. Small fleets such as the classic
+one practically never need the fallback. A fleet that cannot be placed even then raises ValueError.
+
+Boards larger than TABLE_CELLS have too many placements for a table. Their placements are computed from a random
+placement number instead and the overlaps are checked against a set of the occupied cells.
+"""
+import random
+from functools import lru_cache
+
+from fleet import DEFAULT_BOARD, CompiledFleet, placementIndex
+
+
+TABLE_CELLS = 10000     # Largest board whose placements are kept in tables
+MAX_RESTARTS = 1000     # Whole fleet draws before only the ship that collided is drawn again
+MAX_SHIP_DRAWS = 1000   # Draws of one ship in the fallback before the whole fleet is drawn again
+FALLBACK_RESTARTS = 10  # Whole fleet draws of the fallback before the fleet counts as impossible to place
+
+
+@lru_cache(maxsize=None)
+def placementTable(size, rows=10, cols=10):
+    """
+    :param size: length of the ship
+    :return: tuple of (bits, cells) for every placement of the ship, where bits has the covered cells set (Player
+    layout) and cells is the list of covered (row, col) cells
+    """
+    table = []
+    for placement in placementIndex(size, rows, cols)[0]:
+        bits = 0
+        for cell in placement:
+            bits |= 1 << cell
+        table.append((bits, [(cell // cols + 1, cell % cols + 1) for cell in placement]))
+    return tuple(table)
+
+
+def placementCount(size, rows, cols):
+    """
+    :return: number of horizontal and vertical placements of a ship on the board
+    """
+    horizontal = rows * (cols - size + 1) if size <= cols else 0
+    vertical = (rows - size + 1) * cols if 1 < size <= rows else 0
+    return horizontal + vertical
+
+
+class FleetGenerator:
+    """
+    Seeded source of uniformly random legal fleets (see the module docstring for the fallback used by fleets too
+    dense to draw whole). Two generators made with the same seed and board produce the same fleets in the same order.
+    """
+    def __init__(self, seed=None, board=DEFAULT_BOARD):
+        """
+        :param seed: seed of the random number generator
+        :param board: BoardConfig with the size of the board and the ships of the fleet
+        """
+        self._rng = random.Random(seed)
+        self._board = board
+        self._names = tuple(name for name, size in board.ships)
+        self._sizes = tuple(size for name, size in board.ships)
+        if board.cells <= TABLE_CELLS:
+            self._tables = tuple(placementTable(size, board.rows, board.cols) for size in self._sizes)
+        else:
+            self._tables = None
+
+    def sampleChoices(self):
+        """
+        Fast path for simulations that only need the occupancy. Only for boards of up to TABLE_CELLS cells.
+        :return: (bits, choices) where bits is the occupancy of the fleet and choices the placement number of every
+        ship in its placementTable. Raises ValueError if the fleet cannot be placed.
+        """
+        if self._tables is None:
+            raise ValueError(f"no placement tables for a board of more than {TABLE_CELLS} cells")
+        randrange = self._rng.randrange
+        tables = self._tables
+        for restart in range(MAX_RESTARTS + FALLBACK_RESTARTS):
+            draws = 1 if restart < MAX_RESTARTS else MAX_SHIP_DRAWS
+            bits = 0
+            choices = []
+            for table in tables:
+                for draw in range(draws):
+                    number = randrange(len(table))
+                    shipBits = table[number][0]
+                    if not bits & shipBits:
+                        break
+                else:           # Overlap, draw the whole fleet again
+                    break
+                bits |= shipBits
+                choices.append(number)
+            else:
+                return bits, choices
+        raise self._tooDense()
+
+    def _tooDense(self):
+        return ValueError(f"could not place {len(self._sizes)} ships of {sum(self._sizes)} cells on a "
+                          f"{self._board.rows}x{self._board.cols} board, the fleet is too dense")
+
+    def _sampleCells(self):
+        """
+        Draws a fleet without tables, for large boards.
+        :return: list of the (row, col) cells of every ship. Raises ValueError if the fleet cannot be placed.
+        """
+        randrange = self._rng.randrange
+        rows, cols = self._board.rows, self._board.cols
+        counts = [placementCount(size, rows, cols) for size in self._sizes]
+        for restart in range(MAX_RESTARTS + FALLBACK_RESTARTS):
+            draws = 1 if restart < MAX_RESTARTS else MAX_SHIP_DRAWS
+            occupied = set()
+            cells = []
+            for size, count in zip(self._sizes, counts):
+                horizontal = rows * (cols - size + 1) if size <= cols else 0
+                for draw in range(draws):
+                    number = randrange(count)
+                    if number < horizontal:
+                        row, col = divmod(number, cols - size + 1)
+                        shipCells = [(row + 1, col + 1 + i) for i in range(size)]
+                    else:
+                        row, col = divmod(number - horizontal, cols)
+                        shipCells = [(row + 1 + i, col + 1) for i in range(size)]
+                    if occupied.isdisjoint(shipCells):
+                        break
+                else:           # Overlap, draw the whole fleet again
+                    break
+                occupied.update(shipCells)
+                cells.append(shipCells)
+            else:
+                return cells
+        raise self._tooDense()
+
+    def sample(self):
+        """
+        :return: a random legal CompiledFleet
+        """
+        if self._tables is None:
+            return CompiledFleet(self._names, self._sampleCells(), self._board.cols)
+        bits, choices = self.sampleChoices()
+        return CompiledFleet(self._names, [table[number][1] for table, number in zip(self._tables, choices)],
+                             self._board.cols)
+
+    def stream(self, count=None):
+        """
+        :param count: number of fleets to produce. None for an endless stream
+        :return: iterator of random legal CompiledFleets
+        """
+        produced = 0
+        while count is None or produced < count:
+            yield self.sample()
+            produced += 1
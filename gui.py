@@ -0,0 +1,594 @@
+"""
+The pygame window of the game. Only main.py imports this module, and only once a window is about to open, so the
+engine, the simulations and the command line tools never load pygame.
+"""
+import random
+import sys
+import time
+import pygame
+from engine import DEFAULT_BOARD, BattleshipEngine, loadFleetData, parseShot, rowName
+from fleetgen import FleetGenerator
+from profiler import CountingRandom, Profiler
+from replay import MoveLogWriter
+
+
+class ImageCache:
+    """
+    Images shared by all sprites. Every file is read from disk once and converted to the pixel format of the display,
+    so that blits do not have to convert pixels every frame. The images can also be packed into a single atlas surface.
+    """
+    FILENAMES = ("grid.png", "ship.png", "attack.png", "missed.png")
+
+    def __init__(self):
+        self._images = {}
+        self._atlas = None
+
+    def preload(self, filenames=FILENAMES, atlas=False):
+        """
+        Loads the images ahead of their first use. Must be called after the display mode is set. The game does not
+        call it: every image is loaded by the first sprite that shows it, which is right before the first frame.
+        :param filenames: image files to load
+        :param atlas: if True, all the images are packed side by side into one surface and the cached images become
+        subsurfaces of it
+        """
+        for filename in filenames:
+            self.get(filename)
+        if atlas:
+            self.buildAtlas()
+
+    def get(self, filename):
+        """
+        :param filename: image file
+        :return: the cached surface for the file, loading it if needed
+        """
+        image = self._images.get(filename)
+        if image is None:
+            image = pygame.image.load(filename)
+            if pygame.display.get_surface() is not None:        # Converting needs the display format
+                image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+            self._images[filename] = image
+        return image
+
+    def buildAtlas(self):
+        """
+        Copies every cached image into one surface and replaces the cached images with subsurfaces of that atlas.
+        The images are stacked in columns as high as the tallest image, tallest first.
+        """
+        images = sorted(self._images.items(), key=lambda item: item[1].get_height(), reverse=True)
+        height = images[0][1].get_height()
+        positions = []
+        x, y, columnWidth = 0, 0, 0
+        for filename, image in images:
+            if y + image.get_height() > height:     # Start a new column
+                x += columnWidth
+                y, columnWidth = 0, 0
+            positions.append((x, y))
+            y += image.get_height()
+            columnWidth = max(columnWidth, image.get_width())
+        self._atlas = pygame.Surface((x + columnWidth, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self._atlas = self._atlas.convert_alpha()
+        for (filename, image), (x, y) in zip(images, positions):
+            self._atlas.blit(image, (x, y))
+            self._images[filename] = self._atlas.subsurface((x, y, image.get_width(), image.get_height()))
+
+    def getMemoryUsage(self):
+        """
+        :return: number of bytes used by the pixels of the cached images
+        """
+        if self._atlas is not None:
+            return self._atlas.get_pitch() * self._atlas.get_height()
+        return sum(image.get_pitch() * image.get_height() for image in self._images.values())
+
+
+IMAGES = ImageCache()
+
+CELL_SIZE = 34          # Pixels between two cells of a board
+PLAYER_X = 48           # x of column 0 of the player board, so column col is at PLAYER_X + CELL_SIZE * col
+GUESS_X = 479           # Same for the guess board
+BOARD_Y = 46            # y of row 0 of both boards
+VIEW_SIZE = 10          # Rows and columns shown at once, the size of grid.png
+SINK_X = 560            # x of the message announcing the last ship sunk
+SCROLL_KEYS = {pygame.K_UP: (-VIEW_SIZE, 0), pygame.K_DOWN: (VIEW_SIZE, 0), pygame.K_LEFT: (0, -VIEW_SIZE),
+               pygame.K_RIGHT: (0, VIEW_SIZE)}
+
+
+class SpriteClass(pygame.sprite.Sprite):
+    """
+    Taken from the textbook ImageSprite class. Creates a sprite representation given a position and filename
+    The image is taken from the shared IMAGES cache, so sprites with the same file share one surface.
+    """
+    def __init__(self, x, y, filename) :
+        super().__init__()
+        self.loadImage(x, y, filename)
+
+    def loadImage(self, x, y, filename) :
+        img = IMAGES.get(filename)
+        self.image = img
+        self.rect = self.image.get_rect()
+        self.rect.x = x
+        self.rect.y = y - self.rect.height
+
+class Board(SpriteClass):
+    """
+    Grid for both boards
+    """
+    def __init__(self, x, y):
+        super().__init__(x, y, "grid.png")
+        self._layer = 1
+
+class Ship(SpriteClass):
+    """
+    Represents a unit of a Ship
+    """
+    def __init__(self, x, y):
+        super().__init__(x, y, "ship.png")
+        self._layer = 2
+
+class Attack(SpriteClass):
+    """
+    Attack unit for when a hit is made
+    """
+    def __init__(self, x, y):
+        super().__init__(x, y, "attack.png")
+        self._layer = 3
+
+class Missed(SpriteClass):
+    """
+    Sprite that displays a missed attempt by the player
+    """
+    def __init__(self, x, y):
+        super().__init__(x, y, "missed.png")
+        self._layer = 2
+
+
+class Battleship:
+    """
+    Provides functions to run and start a battleship game. The game will display on a 900 by 500 pixel screen.
+    The game state itself is held by a BattleshipEngine, this class only displays it and handles the input.
+    Boards larger than 10x10 are shown through a 10x10 viewport that the arrow keys move, and only the cells inside
+    the viewport get sprites.
+    """
+    def __init__(self, computer=None, incremental=True, randomEnemy=False, log=None, profile=False, profileLog=None,
+                 board=DEFAULT_BOARD):
+        """
+        Initializes all the necessary game variables and starts the game
+        :param computer: shooter that plays the computer turns, or a function (such as a shooter class) called with
+        (rng, board) that makes one, for example DensityShooter. Defaults to the hunt/target intelligence of the engine.
+        A shooter made by a function draws from the random generator of the game, so its draws follow the logged seed
+        and are counted by the profiler. A ready made shooter keeps its own generator and its draws are not counted.
+        :param incremental: if True, only the parts of the screen that changed are redrawn and frames where nothing
+        changed are skipped. If False, the whole screen is redrawn every frame.
+        :param randomEnemy: if True, the computer gets a new random fleet instead of the enemyShips of the JSON file
+        :param log: optional move log file that the game is appended to, see replay.py
+        :param profile: if True, frame and turn timings are recorded and shown in the top left corner
+        :param profileLog: optional JSON lines file that the timings are appended to when the game is closed. Turns
+        profiling on.
+        :param board: BoardConfig of the game. Games on any other board than the default one use random fleets for
+        both sides instead of the JSON file.
+        """
+        pygame.display.init()       # Only the subsystems the game uses, pygame.init would also start audio and joysticks
+        pygame.font.init()
+        self.loadJson()    # Opens the JSON file that contains the ship data for the computer and the player
+        self._screen = pygame.display.set_mode((900, 500))      # Start the game
+        self._clock = pygame.time.Clock()
+        self._allSprites = pygame.sprite.LayeredUpdates()
+        self._text = ""                     #     Initialize the text box
+        self._fonts = {}        # Size -> font, made on first use
+        self._inputBox = pygame.Rect(100, 430, 140, 32)
+        self._colorInactive = pygame.Color('lightskyblue3')
+        self._colorActive = pygame.Color('dodgerblue2')
+        self._color = self._colorInactive
+        self._active = False
+        self._ticks = 0     # Game time
+        self._log = MoveLogWriter(log) if log is not None else None
+        self._profiler = Profiler() if profile or profileLog is not None else None
+        self._profileLog = profileLog
+        seed = random.getrandbits(63)       # Written to the move log, so every generator of the game is made from it
+        self._rng = CountingRandom(seed) if self._profiler is not None else random.Random(seed)     # Counts the draws of each computer shot when profiling
+        self._board = board
+        if callable(computer):
+            computer = computer(self._rng, board)
+        self._engine = BattleshipEngine(self._rng, computer=computer, seed=seed, recorder=self._log, board=board)     # Virtual grids, ship counts and the computer intelligence
+        self._gameOver = False      #  Controls the game over screen
+        self._incremental = incremental
+        self._randomEnemy = randomEnemy
+        self._dirtyRects = [self._screen.get_rect()]        # Parts of the screen that need to be redrawn
+        self._textChanged = True
+        self._overlay = None        # Rendered profiler text
+        self._viewRow = 1           # Top left cell of the viewport
+        self._viewCol = 1
+        self._viewLabel = None      # Rendered position of the viewport, only for boards larger than the viewport
+        self._sinkMessage = None    # Rendered text of the last ship sunk
+        self._engine.addSinkListener(self.showSink)
+
+    def loadJson(self):
+        self._data = loadFleetData("usrData.json")
+
+    def update(self):
+        """
+        Function that displays all sprites in the allSprites group at each loop of the game.
+        """
+        self._allSprites.update()
+
+    def draw(self, area=None):
+        """
+        Draws allSprites group to the screen
+        :param area: pygame.Rect being redrawn, None for the whole screen. Only the sprites overlapping it are blitted.
+        """
+        if area is None:
+            self._allSprites.draw(self._screen)
+            return
+        sprites = self._allSprites.sprites()        # Lowest layer first
+        for index in area.collidelistall([sprite.rect for sprite in sprites]):
+            self._screen.blit(sprites[index].image, sprites[index].rect)
+
+    def getFont(self, size=32):
+        """
+        :return: the default font in the given size. Fonts are only decoded when first needed.
+        """
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def add(self, sprite):
+        """
+        Adds a sprite to the group of sprites that gets displayed to the screen.
+        :param sprite: Expects an instance of SpriteClass or one of its subclasses
+        """
+        self._allSprites.add(sprite)
+        self.markDirty(getattr(sprite, "rect", None))      # Groups have no rect, so the whole screen is redrawn
+
+    def markDirty(self, rect=None):
+        """
+        Marks part of the screen to be redrawn on the next frame.
+        :param rect: pygame.Rect of the changed area. None marks the whole screen.
+        """
+        self._dirtyRects.append(self._screen.get_rect() if rect is None else rect.copy())
+
+    def markTextChanged(self):
+        """
+        Called whenever the text or the color of the text box changes, so that it is rendered again.
+        """
+        self._textChanged = True
+        self.markDirty(pygame.Rect(self._inputBox.x, self._inputBox.y, self._screen.get_width() - self._inputBox.x,
+                                   self._inputBox.h))     # The box can grow up to the right edge of the screen
+
+    def render(self):
+        """
+        Redraws the dirty parts of the screen and sends only those parts to the display. Every dirty rectangle is
+        painted on its own, so a turn repaints the text box and two cells instead of the box around all of them. Does
+        nothing if no part of the screen has changed since the last frame.
+        """
+        if not self._incremental:
+            self._textChanged = True
+            self._dirtyRects = [self._screen.get_rect()]
+        if not self._dirtyRects:
+            return
+        profiler = self._profiler
+        self.update()
+        if profiler is not None:
+            profiler.lap("update")
+        if self._textChanged:
+            self._textSurface = self.getFont().render(self._text, True, self._color)        # Show text and textbox on screen.
+            self._inputBox.w = max(400, self._textSurface.get_width() + 10)
+            self._textChanged = False
+        if profiler is not None:
+            profiler.lap("text")
+        for area in self.dirtyAreas():
+            self._screen.set_clip(area)         # Blits outside of the changed area are skipped
+            self._screen.fill((0, 25, 87))      # Background color of game
+            if self._gameOver:          # The game over text will only show when one of the scores is set to 0
+                self._screen.blit(self._gameOverMessage, (370, 100))
+                self._screen.blit(self._resultString, (330, 200))
+                self._screen.blit(self._endGameMessage, (270, 300))
+            else:
+                if self._viewLabel is not None:
+                    self._screen.blit(self._viewLabel, (50, 404))
+                if self._sinkMessage is not None:
+                    self._screen.blit(self._sinkMessage, (SINK_X, 404))
+            self._screen.blit(self._textSurface, (self._inputBox.x + 5, self._inputBox.y + 5))  # Show text box on screen
+            pygame.draw.rect(self._screen, self._color, self._inputBox, 2)
+            self.draw(area)         # Draw game to screen.
+            if self._overlay is not None:
+                self._screen.blit(self._overlay, (5, 5))
+        self._screen.set_clip(None)
+        if profiler is not None:
+            profiler.lap("draw")
+        pygame.display.update(self._dirtyRects)
+        self._dirtyRects = []
+        if profiler is not None:
+            profiler.lap("display")
+
+    def dirtyAreas(self):
+        """
+        :return: the dirty rectangles, without the ones lying inside another one
+        """
+        rects = self._dirtyRects
+        areas = []
+        for index, rect in enumerate(rects):
+            if not any(other.contains(rect) and (other != rect or before < index) for before, other in enumerate(rects)
+                       if before != index):
+                areas.append(rect)
+        return areas
+
+    def updateOverlay(self):
+        """
+        Renders the frame time statistics of the profiler and the memory used by the cached images in the top left
+        corner of the screen.
+        """
+        if self._overlay is not None:
+            self.markDirty(self._overlay.get_rect(topleft=(5, 5)))      # Clear the previous text
+        mean, p99, worst = self._profiler.summary()
+        text = (f"frame {mean:.2f} ms  p99 {p99:.2f} ms  max {worst:.2f} ms  images "
+                f"{IMAGES.getMemoryUsage() / 1024:.0f} KiB")
+        self._overlay = self.getFont(20).render(text, True, (189, 205, 206))
+        self.markDirty(self._overlay.get_rect(topleft=(5, 5)))
+
+    def cellPosition(self, x, row, col):
+        """
+        :param x: PLAYER_X or GUESS_X
+        :return: (x, y) of the sprite of the cell on the screen, or None if the cell is outside the viewport
+        """
+        row -= self._viewRow - 1
+        col -= self._viewCol - 1
+        if not (1 <= row <= VIEW_SIZE and 1 <= col <= VIEW_SIZE):
+            return None
+        return x + CELL_SIZE * col, BOARD_Y + CELL_SIZE * row
+
+    def addCell(self, spriteClass, x, row, col):
+        """
+        Adds a sprite for a cell of a board, if the cell is inside the viewport.
+        :param spriteClass: Ship, Attack or Missed
+        :param x: PLAYER_X or GUESS_X
+        """
+        position = self.cellPosition(x, row, col)
+        if position is not None:
+            self.add(spriteClass(*position))
+
+    def scrollView(self, rows, cols):
+        """
+        Moves the viewport and rebuilds the sprites of the cells that are now inside it from the engine state. Only the
+        VIEW_SIZE x VIEW_SIZE visible cells are looked at, whatever the size of the board.
+        :param rows: number of rows to move down (negative for up)
+        :param cols: number of columns to move right (negative for left)
+        """
+        board = self._board
+        viewRow = min(max(1, self._viewRow + rows), max(1, board.rows - VIEW_SIZE + 1))
+        viewCol = min(max(1, self._viewCol + cols), max(1, board.cols - VIEW_SIZE + 1))
+        if (viewRow, viewCol) == (self._viewRow, self._viewCol) or self._gameOver:
+            return
+        self._viewRow, self._viewCol = viewRow, viewCol
+        self.updateViewLabel()
+        engine = self._engine
+        user, computer = engine.getUserGrid(), engine.getComputerGrid()
+        computerAttempts, playerAttempts = engine.getComputerAttempts(), engine.getPlayerAttempts()
+        self._allSprites.empty()
+        self.displayBoards()
+        for row in range(viewRow, min(viewRow + VIEW_SIZE, board.rows + 1)):
+            for col in range(viewCol, min(viewCol + VIEW_SIZE, board.cols + 1)):
+                if user.isTrue(row, col):
+                    self.addCell(Ship, PLAYER_X, row, col)
+                if computerAttempts.isTrue(row, col):
+                    self.addCell(Attack if user.isTrue(row, col) else Missed, PLAYER_X, row, col)
+                if playerAttempts.isTrue(row, col):
+                    self.addCell(Attack if computer.isTrue(row, col) else Missed, GUESS_X, row, col)
+
+    def updateViewLabel(self):
+        """
+        Renders the rows and columns shown by the viewport below the boards.
+        """
+        if self._viewLabel is not None:
+            self.markDirty(self._viewLabel.get_rect(topleft=(50, 404)))
+        board = self._board
+        lastRow = min(self._viewRow + VIEW_SIZE - 1, board.rows)
+        lastCol = min(self._viewCol + VIEW_SIZE - 1, board.cols)
+        text = (f"rows {rowName(self._viewRow)}-{rowName(lastRow)}, columns {self._viewCol}-{lastCol} of a "
+                f"{board.rows}x{board.cols} board (arrow keys to scroll)")
+        self._viewLabel = self.getFont(20).render(text, True, (189, 205, 206))
+        self.markDirty(self._viewLabel.get_rect(topleft=(50, 404)))
+
+    def showSink(self, side, fleet, ship):
+        """
+        Sink listener of the engine: renders which ship was just sunk below the guess board.
+        :param side: "player" if the player sank a ship of the computer, "computer" otherwise
+        :param fleet: CompiledFleet the ship belongs to
+        :param ship: number of the ship in that fleet
+        """
+        if self._sinkMessage is not None:
+            self.markDirty(self._sinkMessage.get_rect(topleft=(SINK_X, 404)))
+        name = fleet.getName(ship)
+        text = f"You sank the {name}!" if side == "player" else f"The computer sank your {name}!"
+        self._sinkMessage = self.getFont(20).render(text, True, (189, 205, 206))
+        self.markDirty(self._sinkMessage.get_rect(topleft=(SINK_X, 404)))
+
+    def quit(self):
+        """
+        Closes the window and exits. The profiler timings are exported first if a profile log was given.
+        """
+        if self._profiler is not None and self._profileLog is not None:
+            self._profiler.exportJsonLines(self._profileLog)
+        pygame.quit()
+        sys.exit()
+
+    def getTicks(self):
+        return self._ticks
+
+    def initFleets(self):
+        """
+        Places the ships from the JSON file onto the virtual grids and displays the player ships on the screen.
+        If the fleets are not valid, every problem is printed and the game quits. Boards other than the default one
+        get random fleets, and the game quits the same way if the ships cannot be placed on the board.
+        """
+        if self._board != DEFAULT_BOARD:
+            generator = FleetGenerator(board=self._board)
+            try:
+                playerFleet = generator.sample()
+                self._engine.setFleets(playerFleet, generator.sample())
+            except ValueError as error:
+                print(error)
+                self.quit()
+            cells = playerFleet.allCells()
+        else:
+            try:
+                cells = self._engine.loadFleets(self._data, FleetGenerator().sample() if self._randomEnemy else None)
+            except ValueError as error:
+                print(error)
+                self.quit()
+        for row, col in cells:
+            self.addCell(Ship, PLAYER_X, row, col)
+        if self._board.rows > VIEW_SIZE or self._board.cols > VIEW_SIZE:
+            self.updateViewLabel()
+
+    def sendAttack(self, inputString):
+        """
+        :param inputString: this text is received from the textbox that is displayed on the screen. Called when return is hit
+        and whatever string is written in the text box will be passed into this function.
+        :return: Validates the input. If a hit is made, then a red dot will be displayed on the guess board. If not, then a
+        missed sprite will be placed at that position. After placing a sprite, the sendComputerAttack function will be called.
+        """
+        started = time.perf_counter()
+        shot = parseShot(inputString, self._board)
+        if shot is None:
+            return False
+        rowVal, colVal = shot
+        hit = self._engine.playerAttack(rowVal, colVal)
+        if hit is None:         # Already guessed
+            return False
+        if hit:
+            self.addCell(Attack, GUESS_X, rowVal, colVal)   # Places a red dot onto the hit ship unit
+        else:               # if missed
+            self.addCell(Missed, GUESS_X, rowVal, colVal)       # Place a missed unit onto the guessed spot
+        computerStarted = time.perf_counter()
+        rngCalls = self._rng.calls if self._profiler is not None else 0
+        self.sendComputerAttack()              # Everytime a user sets a shot, the computer will send one as well.
+        if self._profiler is not None:
+            finished = time.perf_counter()
+            self._profiler.recordTurn((finished - started) * 1000, (finished - computerStarted) * 1000,
+                                      self._rng.calls - rngCalls)
+        if self._log is not None:
+            self._log.flush()       # Keep the log complete even if the window is closed
+
+    def sendComputerAttack(self):
+        """
+        Called only when the user has sent a valid shot. The engine picks the computer shot and the result is displayed.
+        """
+        rowVal, colVal, hit = self._engine.computerAttack()
+        if hit:
+            self.addCell(Attack, PLAYER_X, rowVal, colVal)           # Display a hit unit
+        else:
+            self.addCell(Missed, PLAYER_X, rowVal, colVal)        # Missed. Display missed unit.
+
+    def showReplay(self, state):
+        """
+        Replaces the sprites on the screen with the ships and shots of a replayed game.
+        :param state: replay.ReplayState to display
+        """
+        self._allSprites.empty()
+        self.displayBoards()
+        user, computer = state.getUser(), state.getComputer()
+        for row, col in user:
+            self.addCell(Ship, PLAYER_X, row, col)
+        for row, col in state.getAttempts():
+            self.addCell(Attack if user.isTrue(row, col) else Missed, PLAYER_X, row, col)
+        for row, col in state.getPlayerAttempts():
+            self.addCell(Attack if computer.isTrue(row, col) else Missed, GUESS_X, row, col)
+
+    def viewReplay(self, state, title):
+        """
+        Shows a replayed game until the window is closed or the escape key is pressed.
+        :param state: replay.ReplayState to display
+        :param title: text shown below the boards, for example the game and turn numbers
+        """
+        self.showReplay(state)
+        self._viewLabel = self.getFont(20).render(title, True, (189, 205, 206))
+        self.markDirty()
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    self.quit()
+            self.render()
+            self._clock.tick(60)
+
+    def displayBoards(self):
+        """
+        Called only when the game starts. Displays the player board and the guess board.
+        """
+        player_board = Board(50, 400)
+        guess_board = Board(480,400)
+        gameBoards = pygame.sprite.Group()
+        gameBoards.add(player_board)
+        gameBoards.add(guess_board)
+        self.add(gameBoards)
+
+    def displayGameover(self, result: str):
+        """
+        Called only when one of the shipCounts is set to zero
+        :param result:  The result string to the displayed to the string
+        :return: Renders the text to be displayed onto the game over screen.
+        """
+        self._allSprites.empty()        # Clear the screen
+        self._active = False            # Remove the input text box functionality
+        self._color = (0, 25, 87)           # Make the input text box transparent
+        self._gameOverMessage = self.getFont().render("Game Over", True, (189, 205, 206))       # Render the game over texts
+        self._resultString = self.getFont().render(result, True, (189, 205, 206))
+        self._endGameMessage = self.getFont().render("Press the escape key to close the window", True, (189, 205, 206))
+        self.markTextChanged()
+        self.markDirty()
+
+    def run(self):
+        """
+        Called every loop of the game. This is the game loop
+        """
+        profiler = self._profiler
+        while True:
+            if profiler is not None:
+                profiler.beginFrame()
+            for event in pygame.event.get():
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:        # Quit the game whenever the escape is called at any time.
+                        self.quit()
+                    if event.key in SCROLL_KEYS:        # Arrow keys move the viewport of large boards
+                        self.scrollView(*SCROLL_KEYS[event.key])
+                    elif self._active:    # active is only true if the user has clicked on the textbox
+                        if event.key == pygame.K_RETURN:    # Sends text to sendAttack function when enter is pressed
+                            self.sendAttack(self._text)
+                            self._text = ""     # Clear the text box
+                        elif event.key == pygame.K_BACKSPACE:
+                            self._text = self._text[:-1]        # Delete a character from the text box
+                        else:
+                            self._text += event.unicode     # If a letter is pressed while in active mode, it will be added
+                        self.markTextChanged()
+                elif event.type == pygame.QUIT:     # If the close button is pressed, close the game.
+                    self.quit()
+                elif event.type == pygame.MOUSEBUTTONDOWN:      # If the game is not over, a click on the text box will allow for
+                    if not self._gameOver:                      # text to be typed into it.
+                        if self._inputBox.collidepoint(event.pos):
+                            self._active = not self._active
+                        else:
+                            self._active = False            # Toggles the color of the textbox when in active mode.
+                        self._color = self._colorActive if self._active else self._colorInactive
+                        self.markTextChanged()
+
+            if self.getTicks() == 0:        # When the game starts, initialize the player and computer virtual grids
+                self.displayBoards()       # and display the players ships to the screen.
+                self.initFleets()
+
+            if not self._gameOver and self._engine.winner() is not None:     # If all of a players ships are sunk, game over
+                self._gameOver = True
+                if self._engine.winner() == "computer":
+                    self.displayGameover("The computer has won :(")        # Text to be displayed in game over screen.
+                else:
+                    self.displayGameover("!!! You have won !!!")
+
+            if profiler is not None:
+                profiler.lap("events")
+                if self._ticks % 30 == 0:       # Twice a second
+                    self.updateOverlay()
+            self.render()
+            self._clock.tick(60)
+            if profiler is not None:
+                profiler.lap("tick")
+                profiler.endFrame()
+            self._ticks += 1
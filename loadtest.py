@@ -0,0 +1,167 @@
+"""
+Load test for server.py. Starts many bots at once, each one connecting to the server and playing complete games with
+the hunt/target intelligence, and reports the number of games per second and the response time of the server.
+
+Every bot holds one file descriptor, and with --local the server holds a second one per bot. The soft limit on open
+files is raised to fit when the hard limit allows it. Otherwise only as many bots play at once as the limit allows.
+Connections that still fail, for example with EMFILE, count as errors.
+
+Usage: python loadtest.py [--bots N] [--games N] [--mode ai|human] [--host HOST] [--port PORT] [--local]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+try:
+    import resource
+except ImportError:         # Not on Windows
+    resource = None
+
+from engine import HuntShooter, letterSwitch
+from server import GameServer, cellName
+
+
+RESERVED_FILES = 64     # Open files kept free for the interpreter and the listening socket
+
+
+class Bot:
+    """
+    A client that plays games against the server and measures how long the server takes to answer each shot.
+    """
+    def __init__(self, host, port, mode, rng, slots=None):
+        """
+        :param slots: optional asyncio.Semaphore every game holds while it is connected, to bound open connections
+        """
+        self._host = host
+        self._port = port
+        self._mode = mode
+        self._rng = rng
+        self._slots = slots
+        self.latencies = []
+        self.games = 0
+        self.errors = 0
+
+    async def playGame(self):
+        reader, writer = await asyncio.open_connection(self._host, self._port)
+        shooter = HuntShooter(self._rng)
+        pending = None
+        sentAt = 0.0
+        try:
+            await reader.readline()         # WELCOME
+            writer.write(f"PLAY {self._mode.upper()}\n".encode())
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    self.errors += 1
+                    return
+                if line == "TURN":
+                    pending = shooter.nextShot()
+                    sentAt = time.perf_counter()
+                    writer.write(f"{cellName(*pending)}\n".encode())
+                elif line.startswith(("HIT ", "MISS ")):
+                    self.latencies.append(time.perf_counter() - sentAt)
+                    letter, number = line.split()[1].split(",")
+                    shooter.recordResult(letterSwitch(letter), int(number), line.startswith("HIT"))
+                elif line.startswith("SUNK "):
+                    cells = [cell.split(",") for cell in line.split()[2:]]
+                    shooter.recordSunk([(letterSwitch(letter), int(number)) for letter, number in cells])
+                elif line.startswith("ERROR"):
+                    self.errors += 1
+                elif line.startswith("GAME"):
+                    self.games += 1
+                    return
+        finally:
+            writer.close()
+
+    async def run(self, games):
+        for i in range(games):
+            try:
+                if self._slots is None:
+                    await self.playGame()
+                else:
+                    async with self._slots:
+                        await self.playGame()
+            except OSError:         # Includes ConnectionError and running out of file descriptors
+                self.errors += 1
+
+
+def raiseFileLimit(needed):
+    """
+    Raises the soft limit on open files to at least needed, as far as the hard limit allows.
+    :return: the soft limit, or None where it cannot be read
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        soft = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    return soft
+
+
+async def loadTest(host, port, bots, games, mode, local=False, seed=0, concurrency=None):
+    """
+    :param bots: number of bots playing at the same time
+    :param games: number of games played by every bot
+    :param mode: "ai" or "human". Human games pair the bots with each other
+    :param local: if True, a GameServer is started in this process first
+    :param concurrency: largest number of games connected at once, None for no limit. Human games need both bots of
+    a pair connected, so it should be even.
+    :return: dictionary with the results
+    """
+    server = None
+    if local:
+        server = GameServer(host, port)
+        await server.start()
+    rng = random.Random(seed)
+    slots = asyncio.Semaphore(concurrency) if concurrency is not None else None
+    players = [Bot(host, port, mode, random.Random(rng.random()), slots) for i in range(bots)]
+    start = time.perf_counter()
+    await asyncio.gather(*(bot.run(games) for bot in players))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+    latencies = sorted(latency for bot in players for latency in bot.latencies)
+    played = sum(bot.games for bot in players)
+    return {
+        "bots": bots,
+        "games": played,
+        "errors": sum(bot.errors for bot in players),
+        "seconds": elapsed,
+        "gamesPerSecond": played / elapsed,
+        "shots": len(latencies),
+        "p50ms": 1000 * statistics.median(latencies) if latencies else 0,
+        "p99ms": 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else 0,
+    }
+
+
+def main():
+    """
+    Runs the load test from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Play many bot games against a battleship server.")
+    parser.add_argument("--bots", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=1, help="games per bot")
+    parser.add_argument("--mode", choices=("ai", "human"), default="ai")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--local", action="store_true", help="start a server in this process")
+    args = parser.parse_args()
+    perBot = 2 if args.local else 1
+    needed = args.bots * perBot + RESERVED_FILES
+    limit = raiseFileLimit(needed)
+    concurrency = None
+    if limit is not None and limit != resource.RLIM_INFINITY and limit < needed:
+        concurrency = max(2, (limit - RESERVED_FILES) // perBot // 2 * 2)
+        print(f"{args.bots} bots need about {needed} open files but the limit is {limit}, playing {concurrency} games "
+              f"at a time")
+    results = asyncio.run(loadTest(args.host, args.port, args.bots, args.games, args.mode, args.local,
+                                   concurrency=concurrency))
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
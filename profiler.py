@@ -0,0 +1,138 @@
+"""
+Opt-in timing of the game loop. Frame and turn timings are written into fixed size ring buffers and can be exported as
+JSON lines. Nothing here imports pygame; the on-screen overlay is drawn by Battleship.
+"""
+import json
+import random
+import time
+from array import array
+
+
+FRAME_FIELDS = ("events", "update", "text", "draw", "display", "tick", "total")
+TURN_FIELDS = ("sendAttack", "sendComputerAttack", "rngCalls")
+
+
+class RingBuffer:
+    """
+    Keeps the last capacity rows of a fixed set of numeric fields. Each field is a preallocated array of doubles, so
+    appending never allocates, never takes a lock and overwrites the oldest row once the buffer is full. There is a
+    single writer (the game loop); readers copy the rows out with rows().
+    """
+    def __init__(self, fields, capacity=1024):
+        self._fields = tuple(fields)
+        self._columns = [array("d", bytes(8 * capacity)) for field in self._fields]
+        self._capacity = capacity
+        self._written = 0
+
+    def append(self, *values):
+        position = self._written % self._capacity
+        for column, value in zip(self._columns, values):
+            column[position] = value
+        self._written += 1     # Only advanced after the row is complete, so readers never see half a row
+
+    def __len__(self):
+        return min(self._written, self._capacity)
+
+    def getWritten(self):
+        """
+        :return: number of rows appended since the buffer was made, including overwritten ones
+        """
+        return self._written
+
+    def rows(self):
+        """
+        :return: list of dictionaries, oldest row first
+        """
+        written = self._written
+        count = min(written, self._capacity)
+        rows = []
+        for index in range(written - count, written):
+            position = index % self._capacity
+            rows.append({field: column[position] for field, column in zip(self._fields, self._columns)})
+        return rows
+
+    def column(self, field):
+        """
+        :return: list of the values of one field, oldest first
+        """
+        return [row[field] for row in self.rows()]
+
+
+class CountingRandom(random.Random):
+    """
+    random.Random that counts its randint calls, to see how many random draws each computer shot takes.
+    """
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.calls = 0
+
+    def randint(self, a, b):
+        self.calls += 1
+        return super().randint(a, b)
+
+
+class Profiler:
+    """
+    Collects the time spent in each part of a frame and in each turn. The game loop calls beginFrame, then lap after
+    each part with the name of the part, then endFrame. Times are in milliseconds.
+    """
+    def __init__(self, capacity=1024):
+        self._frames = RingBuffer(FRAME_FIELDS, capacity)
+        self._turns = RingBuffer(TURN_FIELDS, capacity)
+        self._current = dict.fromkeys(FRAME_FIELDS, 0.0)
+        self._frameStart = 0.0
+        self._lapStart = 0.0
+
+    def beginFrame(self):
+        for field in FRAME_FIELDS:
+            self._current[field] = 0.0
+        self._frameStart = self._lapStart = time.perf_counter()
+
+    def lap(self, field):
+        """
+        Adds the time since the previous lap (or the start of the frame) to a field of the current frame.
+        """
+        now = time.perf_counter()
+        self._current[field] += (now - self._lapStart) * 1000
+        self._lapStart = now
+
+    def endFrame(self):
+        """
+        Stores the current frame. Its total is the time spent working, without the time waiting in tick.
+        """
+        self._current["total"] = (time.perf_counter() - self._frameStart) * 1000 - self._current["tick"]
+        self._frames.append(*(self._current[field] for field in FRAME_FIELDS))
+
+    def recordTurn(self, sendAttack, sendComputerAttack, rngCalls):
+        """
+        :param sendAttack: milliseconds spent in sendAttack, including the computer turn
+        :param sendComputerAttack: milliseconds spent in sendComputerAttack
+        :param rngCalls: number of random draws the computer made for its shot
+        """
+        self._turns.append(sendAttack, sendComputerAttack, rngCalls)
+
+    def getFrames(self):
+        return self._frames
+
+    def getTurns(self):
+        return self._turns
+
+    def summary(self):
+        """
+        :return: (mean, p99, max) of the total frame time in milliseconds over the buffered frames
+        """
+        totals = sorted(self._frames.column("total"))
+        if not totals:
+            return 0.0, 0.0, 0.0
+        return sum(totals) / len(totals), totals[int(0.99 * (len(totals) - 1))], totals[-1]
+
+    def exportJsonLines(self, filename):
+        """
+        Appends every buffered frame and turn to a JSON lines file, one object per line with a "type" of "frame" or
+        "turn".
+        """
+        with open(filename, "a") as file:
+            for row in self._frames.rows():
+                file.write(json.dumps({"type": "frame", **row}) + "\n")
+            for row in self._turns.rows():
+                file.write(json.dumps({"type": "turn", **row}) + "\n")
@@ -0,0 +1,414 @@
+"""
+Append-only binary move log and replay of logged games.
+
+Log layout:
+    header      6 bytes    magic b"BSML", version (uint16)
+    game start  1 byte     0xFF, followed by the seed (uint64) and the player and enemy fleets as corpus records
+    shot        1 byte     cell number (row - 1) * 10 + col - 1, plus 0x80 for a computer shot
+
+Shot bytes are never 0xFF, so games can be found by scanning. The writer also appends the offset of every game to a
+"<log>.idx" file of uint64 values so that a reader can jump straight to any game.
+
+Usage: python replay.py log game turn
+       python replay.py --check GAMES
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import tempfile
+from array import array
+
+from corpus import RECORD_SIZE, decodeFleet, encodeFleet
+from engine import BattleshipEngine, HuntShooter, Player
+from fleetgen import FleetGenerator
+
+
+MAGIC = b"BSML"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+GAME_START = 0xFF
+GAME_HEADER = struct.Struct(f"<Q{RECORD_SIZE}s{RECORD_SIZE}s")
+COMPUTER_SHOT = 0x80
+SNAPSHOT_INTERVAL = 10      # Turns between the snapshots kept by a GameReplay
+FULL_BOARD = (1 << 100) - 1
+NOT_FIRST_COL = sum(1 << row * 10 + col for row in range(10) for col in range(1, 10))
+NOT_LAST_COL = sum(1 << row * 10 + col for row in range(10) for col in range(9))
+
+
+def neighbourBits(bits):
+    """
+    :param bits: cells in the Player layout
+    :return: the cells next to (above, below, left or right of) any of the given cells
+    """
+    return (((bits & NOT_LAST_COL) << 1) | ((bits & NOT_FIRST_COL) >> 1) | (bits << 10) | (bits >> 10)) & FULL_BOARD
+
+
+class MoveLogWriter:
+    """
+    Appends games and shots to a move log. Pass it as the recorder of a BattleshipEngine. Can be used as a context
+    manager.
+    """
+    def __init__(self, filename):
+        self._file = open(filename, "ab")
+        self._index = open(filename + ".idx", "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def startGame(self, seed, playerFleet, enemyFleet):
+        self._index.write(struct.pack("<Q", self._file.tell()))
+        self._file.write(bytes((GAME_START,)) + GAME_HEADER.pack(seed, encodeFleet(playerFleet), encodeFleet(enemyFleet)))
+
+    def recordShot(self, computer, row, col):
+        """
+        :param computer: True for a computer shot, False for a player shot
+        """
+        self._file.write(bytes(((row - 1) * 10 + col - 1 + (COMPUTER_SHOT if computer else 0),)))
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayState:
+    """
+    State of a game after a number of turns: the five grids of the engine and both ship counts. The potentials are
+    the ones the HuntShooter keeps, whatever computer played the game: the unvisited neighbours of its hits, less the
+    ones that were only next to ships it has sunk.
+    """
+    def __init__(self, turn, user, computer, attempts, potentials, playerAttempts, playerCount, computerCount):
+        self.turn = turn
+        self._user = Player(user)
+        self._computer = Player(computer)
+        self._attempts = Player(attempts)
+        self._potentials = Player(potentials)
+        self._playerAttempts = Player(playerAttempts)
+        self._playerCount = playerCount
+        self._computerCount = computerCount
+
+    def getUser(self):
+        """
+        :return: Player grid of the ships of the player
+        """
+        return self._user
+
+    def getComputer(self):
+        """
+        :return: Player grid of the ships of the computer
+        """
+        return self._computer
+
+    def getAttempts(self):
+        """
+        :return: Player grid of the computer shots
+        """
+        return self._attempts
+
+    def getPotentials(self):
+        """
+        :return: Player grid of the target cells of the HuntShooter
+        """
+        return self._potentials
+
+    def getPlayerAttempts(self):
+        """
+        :return: Player grid of the player shots
+        """
+        return self._playerAttempts
+
+    def getPlayerCount(self):
+        return self._playerCount
+
+    def getComputerCount(self):
+        return self._computerCount
+
+    def __str__(self):
+        lines = [f"Turn {self.turn}: player {self._playerCount} units left, computer {self._computerCount} units left",
+                 "   player board          computer board"]
+        for row in range(1, 11):
+            left = "".join(self._cell(self._user, self._attempts, row, col) for col in range(1, 11))
+            right = "".join(self._cell(self._computer, self._playerAttempts, row, col) for col in range(1, 11))
+            lines.append(f"{chr(64 + row)}  {left}   {right}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _cell(fleet, shots, row, col):
+        if shots.isTrue(row, col):
+            return "X " if fleet.isTrue(row, col) else "o "
+        return "# " if fleet.isTrue(row, col) else ". "
+
+
+class GameReplay:
+    """
+    One logged game. States are rebuilt with bit operations only, starting from the closest snapshot before the
+    requested turn. The snapshots are made the first time a state is asked for.
+    """
+    def __init__(self, seed, playerFleet, enemyFleet, shots, snapshotInterval=SNAPSHOT_INTERVAL):
+        """
+        :param seed: seed the game was played with
+        :param playerFleet: CompiledFleet of the player
+        :param enemyFleet: CompiledFleet of the computer
+        :param shots: the shot bytes of the game
+        """
+        self._seed = seed
+        self._playerFleet = playerFleet
+        self._enemyFleet = enemyFleet
+        self._shots = bytes(shots)
+        self._snapshotInterval = snapshotInterval
+        self._snapshots = None
+        self._shipBits = [sum(1 << (row - 1) * 10 + col - 1 for row, col in playerFleet.getCells(ship))
+                          for ship in range(len(playerFleet))]
+
+    def getSeed(self):
+        return self._seed
+
+    def getFleets(self):
+        return self._playerFleet, self._enemyFleet
+
+    def getTurns(self):
+        """
+        :return: number of complete turns (a player shot and a computer shot) in the log
+        """
+        return len(self._shots) // 2
+
+    def _startState(self):
+        return (0, 0, 0, len(self._playerFleet.allCells()), len(self._enemyFleet.allCells()), 0,
+                (0,) * len(self._playerFleet))
+
+    def _advance(self, state, start, end):
+        """
+        Applies shots start to end - 1 to a (attempts, potentials, playerAttempts, playerCount, computerCount,
+        openHits, shipHits) tuple. openHits are the computer hits on player ships still afloat and shipHits the number
+        of hits on every player ship, which tell when a ship sinks and its targets are dropped like in
+        HuntShooter.recordSunk.
+        """
+        attempts, potentials, playerAttempts, playerCount, computerCount, openHits, shipHits = state
+        shipHits = list(shipHits)
+        playerFleet = self._playerFleet
+        computer = self._enemyFleet.getBits()
+        for shot in self._shots[start:end]:
+            if shot & COMPUTER_SHOT:
+                cell = shot - COMPUTER_SHOT
+                bit = 1 << cell
+                attempts |= bit
+                potentials &= ~bit
+                ship = playerFleet.shipAt(cell // 10 + 1, cell % 10 + 1)
+                if ship >= 0:
+                    playerCount -= 1
+                    openHits |= bit
+                    potentials |= neighbourBits(bit) & ~attempts
+                    shipHits[ship] += 1
+                    if shipHits[ship] == playerFleet.getSize(ship):
+                        sunk = self._shipBits[ship]
+                        openHits &= ~sunk
+                        potentials &= ~neighbourBits(sunk) | neighbourBits(openHits)
+            else:
+                bit = 1 << shot
+                playerAttempts |= bit
+                if computer & bit:
+                    computerCount -= 1
+        return attempts, potentials, playerAttempts, playerCount, computerCount, openHits, tuple(shipHits)
+
+    def _makeSnapshots(self):
+        interval = 2 * self._snapshotInterval       # Two shots per turn
+        state = self._startState()
+        self._snapshots = [state]
+        for start in range(0, len(self._shots) - interval + 1, interval):
+            state = self._advance(state, start, start + interval)
+            self._snapshots.append(state)
+
+    def stateAt(self, turn):
+        """
+        :param turn: number of complete turns played, from 0 to getTurns()
+        :return: ReplayState after that turn
+        """
+        if not 0 <= turn <= self.getTurns():
+            raise IndexError(turn)
+        if self._snapshots is None:
+            self._makeSnapshots()
+        snapshot = min(turn // self._snapshotInterval, len(self._snapshots) - 1)
+        state = self._advance(self._snapshots[snapshot], 2 * snapshot * self._snapshotInterval, 2 * turn)
+        return ReplayState(turn, self._playerFleet.getBits(), self._enemyFleet.getBits(), *state[:5])
+
+    def states(self):
+        """
+        Replays the whole game in one pass.
+        :return: iterator of the ReplayState after every turn, starting with turn 0
+        """
+        state = self._startState()
+        for turn in range(self.getTurns() + 1):
+            if turn:
+                state = self._advance(state, 2 * turn - 2, 2 * turn)
+            yield ReplayState(turn, self._playerFleet.getBits(), self._enemyFleet.getBits(), *state[:5])
+
+    def sinks(self):
+        """
+        Finds the sink events of the game in one pass over the shots, like the sink listeners of BattleshipEngine.
+        :return: iterator of (turn, side, ship) for every sunk ship in the order they sank. turn is the turn of the
+        sinking shot, so the ship shows as sunk from stateAt(turn) on, side is "player" when the player sank a computer
+        ship and "computer" otherwise, and ship is the number of the ship in the fleet it belongs to (see getFleets)
+        """
+        sides = {False: ("player", self._enemyFleet, [0] * len(self._enemyFleet)),
+                 True: ("computer", self._playerFleet, [0] * len(self._playerFleet))}
+        for number, shot in enumerate(self._shots):
+            side, fleet, hits = sides[bool(shot & COMPUTER_SHOT)]
+            cell = shot & ~COMPUTER_SHOT
+            ship = fleet.shipAt(cell // 10 + 1, cell % 10 + 1)
+            if ship >= 0:
+                hits[ship] += 1
+                if hits[ship] == fleet.getSize(ship):
+                    yield number // 2 + 1, side, ship
+
+
+class MoveLogReader:
+    """
+    Random access to the games of a move log. The log is memory mapped and the game offsets come from the index file
+    when there is one, or from a single scan of the log otherwise. Can be used as a context manager.
+    """
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a version {VERSION} move log")
+        self._offsets = array("Q")
+        if os.path.exists(filename + ".idx"):
+            with open(filename + ".idx", "rb") as index:
+                self._offsets.frombytes(index.read())
+        else:
+            self._scan()
+
+    def _scan(self):
+        position = HEADER.size
+        while position < len(self._map):
+            self._offsets.append(position)
+            position = self._map.find(bytes((GAME_START,)), position + 1 + GAME_HEADER.size)
+            if position == -1:
+                break
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def getGame(self, number, snapshotInterval=SNAPSHOT_INTERVAL):
+        """
+        :param number: index of the game in the log, starting from 0
+        :return: GameReplay of the game
+        """
+        start = self._offsets[number]
+        end = self._offsets[number + 1] if number + 1 < len(self._offsets) else len(self._map)
+        seed, playerRecord, enemyRecord = GAME_HEADER.unpack_from(self._map, start + 1)
+        shots = self._map[start + 1 + GAME_HEADER.size:end]
+        return GameReplay(seed, decodeFleet(playerRecord), decodeFleet(enemyRecord), shots, snapshotInterval)
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.getGame(number)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def checkRoundTrip(games, seed=None):
+    """
+    Plays games with random fleets into a temporary move log, keeping the grids of the engine and the potentials of
+    its HuntShooter after every turn and the ships its sink listeners report, then replays the log and compares every
+    state and the sink events with the ones kept.
+    :param games: number of games to play
+    :param seed: seed of the games and fleets
+    :return: (turns, mismatches): number of turns compared and number of turns where a replayed state differs, plus
+    one for every game whose sink events differ
+    """
+    rng = random.Random(seed)
+    generator = FleetGenerator(rng.random())
+    expected = []
+    expectedSinks = []
+    turns = mismatches = 0
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "check.bsml")
+        with MoveLogWriter(filename) as writer:
+            for i in range(games):
+                seed = rng.getrandbits(63)
+                gameRng = random.Random(seed)
+                computer = HuntShooter(gameRng)
+                engine = BattleshipEngine(gameRng, computer, seed, writer)
+                engine.setFleets(generator.sample(), generator.sample())
+                player = HuntShooter(random.Random(rng.random()))
+                states = [(0, 0, 0, engine.getUnits("player"))]
+                sinks = []
+                engine.addSinkListener(lambda side, fleet, ship: sinks.append((len(states), side, ship)))
+                while engine.winner() is None:      # The turns of BattleshipEngine.playGame, one at a time
+                    row, col = player.nextShot()
+                    player.recordResult(row, col, engine.playerAttack(row, col))
+                    if engine.getLastSunk() is not None:
+                        player.recordSunk(engine.getLastSunk())
+                    engine.computerAttack()
+                    states.append((engine.getComputerAttempts().getBits(), computer.getPotentials().getBits(),
+                                   engine.getPlayerAttempts().getBits(), engine.getUnits("player")))
+                expected.append(states)
+                expectedSinks.append(sinks)
+        with MoveLogReader(filename) as reader:
+            for game, states, sinks in zip(reader, expected, expectedSinks):
+                for state, replayed in zip(states, game.states()):
+                    turns += 1
+                    if state != (replayed.getAttempts().getBits(), replayed.getPotentials().getBits(),
+                                 replayed.getPlayerAttempts().getBits(), replayed.getPlayerCount()):
+                        mismatches += 1
+                if game.stateAt(game.getTurns()).getPotentials().getBits() != states[-1][1]:      # Through the snapshots
+                    mismatches += 1
+                if list(game.sinks()) != sinks:
+                    mismatches += 1
+    return turns, mismatches
+
+
+def main():
+    """
+    Prints the state of a logged game after a turn, or checks that replays rebuild the state of the engine.
+    """
+    parser = argparse.ArgumentParser(description="Show the state of a logged game after a turn.")
+    parser.add_argument("log", nargs="?", help="move log file")
+    parser.add_argument("game", type=int, nargs="?", help="game number, starting from 0")
+    parser.add_argument("turn", type=int, nargs="?", help="number of turns played")
+    parser.add_argument("--check", type=int, metavar="GAMES",
+                        help="play GAMES games and compare their replay with the engine instead")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.check is not None:
+        turns, mismatches = checkRoundTrip(args.check, args.seed)
+        print(f"{turns} turns compared, {mismatches} mismatches")
+        if mismatches:
+            raise SystemExit(1)
+        return
+    if args.turn is None:
+        parser.error("log, game and turn are required")
+    with MoveLogReader(args.log) as reader:
+        game = reader.getGame(args.game)
+        print(f"Game {args.game} of {len(reader)}, seed {game.getSeed()}, {game.getTurns()} turns")
+        turn = min(args.turn, game.getTurns())
+        print(game.stateAt(turn))
+        for sinkTurn, side, ship in game.sinks():
+            if sinkTurn <= turn:
+                fleet = game.getFleets()[side == "player"]
+                print(f"Turn {sinkTurn}: {side} sank {fleet.getName(ship)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Asyncio game server. Hosts any number of matches at once, human against computer or human against human, over a line
+based text protocol on TCP. Every line is ASCII and ends with a newline.
+
+    server                          client
+    WELCOME battleship 1
+                                    PLAY AI | PLAY HUMAN
+    WAITING                                             (PLAY HUMAN, until a second human connects. Lines sent
+                                                         meanwhile get ERROR waiting for an opponent)
+    START FIRST | START SECOND
+    FLEET A,2 A,3 ...                                   (cells of your ships)
+    TURN                                                (your move)
+                                    A,5                 (same syntax as the text box of the game)
+    HIT A,5 | MISS A,5 | ERROR <reason>
+    SUNK Cruiser A,5 A,6 A,7                            (after a HIT that sank a ship, with the cells of the ship)
+    INCOMING A,5 HIT | INCOMING A,5 MISS                (shot of the opponent)
+    LOST Cruiser                                        (after an INCOMING that sank one of your ships)
+    GAME WIN | GAME LOSE                                (ERROR opponent left, GAME WIN if the other human leaves)
+                                    QUIT                (at any time)
+
+Usage: python server.py [--host HOST] [--port PORT]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import BattleshipEngine, Player, parseShot, rowName
+from fleetgen import FleetGenerator
+
+
+PROTOCOL_VERSION = 1
+BACKLOG = 4096      # Pending connections. With the default of 100, bursts of new clients are dropped by the kernel
+
+
+def cellName(row, col):
+    return f"{rowName(row)},{col}"
+
+
+class ClientGone(Exception):
+    """
+    Raised when a client disconnects or sends QUIT. The only argument is the Connection of that client.
+    """
+
+
+class Connection:
+    """
+    One connected client.
+    """
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    async def send(self, *lines):
+        """
+        Raises ClientGone if the client left.
+        """
+        try:
+            for line in lines:
+                self._writer.write(line.encode() + b"\n")
+            await self._writer.drain()
+        except ConnectionError:
+            raise ClientGone(self)
+
+    async def readLine(self):
+        """
+        :return: the next line without the newline. Raises ClientGone if the client left or sent a line longer than
+        the limit of the stream (64 KiB), which is dropped with its client.
+        """
+        try:
+            data = await self._reader.readline()
+        except (ConnectionError, ValueError):       # readline raises ValueError for a line over the limit
+            raise ClientGone(self)
+        line = data.decode(errors="replace").strip()
+        if not data or line.upper() == "QUIT":
+            raise ClientGone(self)
+        return line
+
+    async def readShot(self, attempts):
+        """
+        Reads lines until the client sends a valid shot that it did not make before.
+        :param attempts: Player grid of the cells already guessed by the client
+        :return: (row, col)
+        """
+        await self.send("TURN")
+        while True:
+            shot = parseShot(await self.readLine())
+            if shot is None:
+                await self.send("ERROR invalid shot, expected a letter and a number like A,5")
+            elif attempts.isTrue(*shot):
+                await self.send("ERROR already guessed")
+            else:
+                return shot
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class RemoteShooter:
+    """
+    Plays the computer side of the engine with shots received from a second human.
+    """
+    def __init__(self):
+        self._attempts = Player()
+        self._shot = None
+
+    def getAttempts(self):
+        """
+        :return: Player grid of the cells the second human has shot at
+        """
+        return self._attempts
+
+    def setShot(self, row, col):
+        self._shot = (row, col)
+
+    def nextShot(self):
+        row, col = self._shot
+        self._attempts.makeTrue(row, col)
+        return row, col
+
+    def recordResult(self, row, col, hit):
+        pass
+
+    def recordSunk(self, cells):
+        pass
+
+
+class Match:
+    """
+    One game between a human and the computer (second is None) or between two humans. The first human plays the player
+    side of the engine and shoots first.
+    """
+    def __init__(self, first, second, fleets, executor):
+        """
+        :param first: Connection of the player that shoots first
+        :param second: Connection of the second human, or None to play against the computer
+        :param fleets: FleetGenerator used for both fleets
+        :param executor: executor that runs the computer turns, so they never block the event loop
+        """
+        self._first = first
+        self._second = second
+        self._executor = executor
+        self._remote = RemoteShooter() if second is not None else None
+        self._engine = BattleshipEngine(computer=self._remote)
+        self._playerFleet = fleets.sample()
+        self._enemyFleet = fleets.sample()
+        self._engine.setFleets(self._playerFleet, self._enemyFleet)
+        self._sunk = []         # Sink events of the last shot, as (side, fleet, ship)
+        self._engine.addSinkListener(lambda side, fleet, ship: self._sunk.append((side, fleet, ship)))
+
+    def _sinkLines(self):
+        """
+        :return: (shooterLines, targetLines) announcing the ships sunk by the last shot
+        """
+        shooterLines = [f"SUNK {fleet.getName(ship)} " + " ".join(cellName(row, col) for row, col in fleet.getCells(ship))
+                        for side, fleet, ship in self._sunk]
+        targetLines = [f"LOST {fleet.getName(ship)}" for side, fleet, ship in self._sunk]
+        self._sunk.clear()
+        return shooterLines, targetLines
+
+    async def run(self):
+        """
+        Plays the match to the end. If one human leaves, the other one wins and ClientGone is raised again.
+        """
+        try:
+            await self._play()
+        except ClientGone as error:
+            await self._forfeit(self._second if error.args[0] is self._first else self._first)
+            raise
+
+    async def _play(self):
+        first, second, engine = self._first, self._second, self._engine
+        fleetLine = "FLEET " + " ".join(cellName(row, col) for row, col in self._playerFleet.allCells())
+        await first.send("START FIRST", fleetLine)
+        if second is not None:
+            await second.send("START SECOND", "FLEET " + " ".join(cellName(row, col)
+                                                                  for row, col in self._enemyFleet.allCells()))
+        while engine.winner() is None:
+            row, col = await first.readShot(engine.getPlayerAttempts())
+            hit = engine.playerAttack(row, col)
+            shooterLines, targetLines = self._sinkLines()
+            await first.send(f"{'HIT' if hit else 'MISS'} {cellName(row, col)}", *shooterLines)
+            if second is not None:
+                await second.send(f"INCOMING {cellName(row, col)} {'HIT' if hit else 'MISS'}", *targetLines)
+                self._remote.setShot(*await second.readShot(self._remote.getAttempts()))
+                row, col, hit = engine.computerAttack()
+                shooterLines, targetLines = self._sinkLines()
+                await second.send(f"{'HIT' if hit else 'MISS'} {cellName(row, col)}", *shooterLines)
+            else:
+                loop = asyncio.get_running_loop()
+                row, col, hit = await loop.run_in_executor(self._executor, engine.computerAttack)
+                shooterLines, targetLines = self._sinkLines()
+            await first.send(f"INCOMING {cellName(row, col)} {'HIT' if hit else 'MISS'}", *targetLines)
+        winner = engine.winner()
+        await first.send("GAME WIN" if winner == "player" else "GAME LOSE")
+        if second is not None:
+            await second.send("GAME WIN" if winner == "computer" else "GAME LOSE")
+
+    async def _forfeit(self, connection):
+        if connection is not None:
+            try:
+                await connection.send("ERROR opponent left", "GAME WIN")
+            except ClientGone:
+                pass
+
+
+class GameServer:
+    """
+    Accepts connections and starts matches. Humans asking for a human opponent wait in a queue until a second one
+    arrives. The stream of the waiting human is read while it waits, so a human who leaves is taken out of the queue
+    instead of being paired.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, workers=4):
+        """
+        :param host: address to listen on
+        :param port: TCP port to listen on
+        :param workers: number of threads used for the computer turns
+        """
+        self._host = host
+        self._port = port
+        self._executor = ThreadPoolExecutor(workers)
+        self._fleets = FleetGenerator()
+        self._waiting = None        # (connection, future, watcher) of the human waiting for an opponent
+        self._server = None
+        self._matches = 0
+
+    def getMatches(self):
+        return self._matches
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle, self._host, self._port, backlog=BACKLOG)
+        return self._server
+
+    async def serveForever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """
+        Runs one connection from the greeting to the end of its match.
+        """
+        connection = Connection(reader, writer)
+        try:
+            await connection.send(f"WELCOME battleship {PROTOCOL_VERSION}")
+            while True:
+                mode = (await connection.readLine()).upper()
+                if mode in ("PLAY AI", "PLAY HUMAN"):
+                    break
+                await connection.send("ERROR expected PLAY AI or PLAY HUMAN")
+            if mode == "PLAY AI":
+                await self._play(connection, None)
+            elif self._waiting is None or self._waiting[2].done():      # Nobody waiting, or a human who just left
+                finished = asyncio.get_running_loop().create_future()
+                watcher = asyncio.ensure_future(self._watch(connection))
+                self._waiting = (connection, finished, watcher)
+                try:
+                    await asyncio.wait((finished, watcher), return_when=asyncio.FIRST_COMPLETED)
+                    if watcher.done() and not watcher.cancelled():
+                        watcher.result()        # Raises ClientGone, the human left before an opponent came
+                    await finished      # The connection is used by the match of the second human
+                finally:
+                    watcher.cancel()
+                    if self._waiting is not None and self._waiting[0] is connection:
+                        self._waiting = None
+            else:
+                opponent, finished, watcher = self._waiting
+                self._waiting = None
+                watcher.cancel()
+                await asyncio.wait((watcher,))      # The match reads the stream of the opponent from now on
+                try:
+                    await self._play(opponent, connection)
+                finally:
+                    finished.set_result(None)
+        except (ClientGone, ConnectionError):
+            pass
+        finally:
+            await connection.close()
+
+    async def _watch(self, connection):
+        """
+        Reads from a waiting human until it leaves, when ClientGone is raised. Cancelled once an opponent arrives.
+        """
+        await connection.send("WAITING")
+        while True:
+            await connection.readLine()
+            await connection.send("ERROR waiting for an opponent")
+
+    async def _play(self, first, second):
+        self._matches += 1
+        await Match(first, second, self._fleets, self._executor).run()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    """
+    Runs the server from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Host battleship matches over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="threads for the computer turns")
+    args = parser.parse_args()
+    server = GameServer(args.host, args.port, args.workers)
+    print(f"Listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serveForever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
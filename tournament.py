@@ -0,0 +1,203 @@
+"""
+Plays many games between computer strategies on all CPU cores and reports win rates and shots-to-win histograms.
+
+Usage: python tournament.py [--games N] [--chunk N] [--workers N] [--seed N] [--board ROWSxCOLS] [--ships SHIPS]
+                            [--book FILE] [strategy ...]
+"""
+import argparse
+import itertools
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from book import BookShooter, MoveBook
+from density import DensityShooter
+from engine import BattleshipEngine, HuntShooter, RandomShooter, loadFleetData
+from fleet import DEFAULT_BOARD, BoardConfig, compileGame
+from fleetgen import FleetGenerator
+
+
+STRATEGIES = {"hunt": HuntShooter, "random": RandomShooter, "density": DensityShooter, "book": BookShooter}     # Shooter classes that take a random generator and a board
+
+
+def makeShooter(name, rng, board, book=None):
+    """
+    :param book: MoveBook of the book strategy
+    :return: a new shooter of the strategy
+    """
+    if name == "book":
+        return BookShooter(rng, board, book)
+    return STRATEGIES[name](rng, board)
+
+
+def playChunk(first, second, data, seed, chunk, games, board=DEFAULT_BOARD, book=None):
+    """
+    Plays one unit of work. Runs inside a worker process.
+    :param first: name of the first strategy
+    :param second: name of the second strategy
+    :param data: fleet dictionary in the usrData.json format, or None to give both sides new random fleets every game
+    :param seed: tournament seed
+    :param chunk: index of this unit. Together with the seed it decides the random generator, so the results do not
+    depend on which worker runs the unit.
+    :param games: number of games to play. The strategies swap sides every game, so both play first equally often.
+    :param board: BoardConfig of the games
+    :param book: book file the book strategy starts from, or None
+    :return: (wins, shots, added) where wins counts the games won by each strategy name, shots maps each strategy name
+    to a Counter of the number of shots it needed to win and added lists the (key, move) entries the unit put in its
+    book
+    """
+    rng = random.Random(f"{seed}-{first}-{second}-{chunk}")
+    generator = FleetGenerator(rng.random(), board) if data is None else None
+    if data is not None:
+        playerFleet, enemyFleet = compileGame(data, board=board)
+    wins = Counter()
+    shots = {first: Counter(), second: Counter()}
+    # Every unit starts from the book file alone, so the results do not depend on the units a worker ran before
+    chunkBook = MoveBook(book, board) if "book" in (first, second) else None
+    for i in range(games):
+        playerName, computerName = (first, second) if i % 2 == 0 else (second, first)
+        engine = BattleshipEngine(rng, makeShooter(computerName, rng, board, chunkBook), board=board)
+        if generator is not None:
+            playerFleet, enemyFleet = generator.sample(), generator.sample()
+        engine.setFleets(playerFleet, enemyFleet)
+        winner, turns = engine.playGame(makeShooter(playerName, rng, board, chunkBook))
+        winnerName = computerName if winner == "computer" else playerName
+        wins[winnerName] += 1
+        shots[winnerName][turns] += 1
+    added = chunkBook.takeAdded() if book is not None and chunkBook is not None else []
+    return wins, shots, added
+
+
+class Tournament:
+    """
+    Round robin between strategies. Every pairing is split into chunks that are played by a process pool, and the
+    results are added up as the chunks finish. With a book file, every worker starts from the file and the entries the
+    workers add are merged into one book that is saved when the tournament ends.
+    """
+    def __init__(self, strategies, data, games=1000, chunk=250, seed=0, board=DEFAULT_BOARD, book=None):
+        """
+        :param strategies: names of the strategies in STRATEGIES
+        :param data: fleet dictionary in the usrData.json format, or None for random fleets
+        :param games: number of games per pairing
+        :param chunk: number of games in one unit of work
+        :param seed: seed that makes the whole tournament reproducible
+        :param board: BoardConfig of the games
+        :param book: book file of the book strategy, or None for a book in memory in every worker. Raises ValueError
+        if the file is not a book for the board.
+        """
+        self._book = MoveBook(book, board) if book is not None else None
+        self._bookFile = book
+        self._pairings = list(itertools.combinations(strategies, 2)) if len(strategies) > 1 else [(strategies[0],) * 2]
+        self._data = data
+        self._games = games
+        self._chunk = chunk
+        self._seed = seed
+        self._board = board
+        self._wins = {pairing: Counter() for pairing in self._pairings}
+        self._shots = {pairing: {name: Counter() for name in pairing} for pairing in self._pairings}
+
+    def run(self, workers=None, progress=None):
+        """
+        :param workers: number of worker processes. Defaults to the number of CPUs
+        :param progress: optional function called with (finished, total) games every time a chunk is done
+        """
+        total = self._games * len(self._pairings)
+        finished = 0
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {}
+            for pairing in self._pairings:
+                for chunk, start in enumerate(range(0, self._games, self._chunk)):
+                    games = min(self._chunk, self._games - start)
+                    future = pool.submit(playChunk, pairing[0], pairing[1], self._data, self._seed, chunk, games,
+                                         self._board, self._bookFile)
+                    futures[future] = (pairing, games)
+            for future in as_completed(futures):
+                pairing, games = futures[future]
+                wins, shots, added = future.result()
+                if self._book is not None:
+                    for key, move in added:
+                        self._book.put(key, move)
+                self._wins[pairing].update(wins)
+                for name, histogram in shots.items():
+                    self._shots[pairing][name].update(histogram)
+                finished += games
+                if progress is not None:
+                    progress(finished, total)
+        if self._book is not None:
+            self._book.save()
+
+    def getBook(self):
+        """
+        :return: the merged MoveBook, or None without a book file
+        """
+        return self._book
+
+    def report(self):
+        """
+        :return: text with the win rate, mean shots to win and shots-to-win histogram of every pairing
+        """
+        lines = []
+        for pairing in self._pairings:
+            first, second = pairing
+            played = sum(self._wins[pairing].values())
+            lines.append(f"{first} vs {second}: {played} games")
+            for name in dict.fromkeys(pairing):
+                wins = self._wins[pairing][name]
+                histogram = self._shots[pairing][name]
+                mean = sum(turns * count for turns, count in histogram.items()) / wins if wins else 0
+                lines.append(f"  {name}: {wins / played:.1%} wins, {mean:.1f} shots to win on average")
+                for turns in sorted(histogram):
+                    lines.append(f"    {turns:3d} {histogram[turns]}")
+        return "\n".join(lines)
+
+
+def main():
+    """
+    Runs a tournament from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Play computer strategies against each other on all CPU cores.")
+    parser.add_argument("strategies", nargs="*", default=["hunt", "random"],
+                        help="strategies to play: " + ", ".join(STRATEGIES))
+    parser.add_argument("--games", type=int, default=1000, help="games per pairing")
+    parser.add_argument("--chunk", type=int, default=250, help="games per unit of work")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fleets", default="usrData.json", help="fleet file in the usrData.json format")
+    parser.add_argument("--random-fleets", action="store_true", help="give both sides new random fleets every game")
+    parser.add_argument("--board", default="10x10", help="board size as ROWSxCOLS, played with random fleets")
+    parser.add_argument("--ships", help="fleet as NAME:SIZE or NAME:SIZExCOUNT items separated by commas, played with "
+                                        "random fleets")
+    parser.add_argument("--book", help="book file of the book strategy, loaded by every worker and saved with the "
+                                       "moves they add")
+    args = parser.parse_args()
+    for name in args.strategies:
+        if name not in STRATEGIES:
+            parser.error(f"unknown strategy {name!r}")
+    try:
+        board = BoardConfig.parse(args.board, args.ships)
+    except ValueError as error:
+        parser.error(str(error))
+
+    data = None if args.random_fleets or board != DEFAULT_BOARD else loadFleetData(args.fleets)
+    if data is None:
+        try:
+            FleetGenerator(args.seed, board).sample()       # Fails here rather than in every worker
+        except ValueError as error:
+            parser.error(str(error))
+    try:
+        tournament = Tournament(args.strategies, data, args.games, args.chunk, args.seed, board, args.book)
+    except ValueError as error:
+        parser.error(str(error))
+    try:
+        tournament.run(args.workers, lambda finished, total: print(f"\r{finished}/{total} games", end="", flush=True))
+    except ValueError as error:         # A fleet the generator could not place, see fleetgen
+        print()
+        parser.error(str(error))
+    print()
+    print(tournament.report())
+    if tournament.getBook() is not None:
+        print(f"Saved {len(tournament.getBook())} book entries to {args.book}")
+
+
+if __name__ == "__main__":
+    main()